@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+"""
+Measures the overhead of checking connections in and out of a
+:class:`~pycassa.pool.ConnectionPool` when many threads share it.
+
+No Cassandra server is needed: the pool hands out connections that
+never touch the network, so the numbers are the cost of the pool alone.
+
+    $ python benchmarks/pool_contention.py --threads 1,8,64 --pool-size 16
+
+"""
+
+import optparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from pycassa.logging.pool_stats_logger import StatsLogger
+from pycassa.pool import ConnectionPool, ConnectionWrapper
+
+
+class _NullTransport(object):
+
+    def __init__(self):
+        self._open = True
+
+    def isOpen(self):
+        return self._open
+
+    def close(self):
+        self._open = False
+
+
+class NullConnection(ConnectionWrapper):
+    """ A connection that skips opening a socket. """
+
+    def __init__(self, pool, server):
+        self._pool = pool
+        self._counted_server = None
+        self._retry_count = 0
+        self.max_retries = pool.max_retries
+        self.info = {}
+        self.server = server
+        self.starttime = time.time()
+        self.last_used = self.starttime
+        self._last_keepalive = self.starttime
+        self._expires = pool._connection_expiry(self.starttime)
+        self.operation_count = 0
+        self._state = ConnectionWrapper._CHECKED_OUT
+        self.transport = _NullTransport()
+        self._pool._notify_on_connect(self)
+
+
+class NullPool(ConnectionPool):
+
+    def _get_new_wrapper(self, server):
+        return NullConnection(self, server)
+
+
+def run(threads, pool_size, seconds, use_threadlocal, stats):
+    pool = NullPool('Keyspace1', server_list=['localhost:9160'],
+                    pool_size=pool_size, max_overflow=0, pool_timeout=-1,
+                    use_threadlocal=use_threadlocal)
+    if stats:
+        pool.add_listener(StatsLogger())
+    counts = [0] * threads
+    start = time.time()
+    end = start + seconds
+
+    # Each worker watches the clock itself; with many busy threads the
+    # main thread can't be relied on to wake up and stop them in time
+    def worker(index):
+        n = 0
+        get, put = pool.get, pool.put
+        while time.time() < end:
+            for i in xrange(100):
+                put(get())
+            n += 100
+        counts[index] = n
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.time() - start
+    pool.dispose()
+    return sum(counts) / elapsed
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--threads', default='1,4,16,64',
+                      help='comma separated thread counts [%default]')
+    parser.add_option('--pool-size', type='int', default=16,
+                      help='connections in the pool [%default]')
+    parser.add_option('--seconds', type='float', default=2.0,
+                      help='duration of each run [%default]')
+    parser.add_option('--threadlocal', action='store_true', default=False,
+                      help='use thread local connections')
+    parser.add_option('--stats', action='store_true', default=False,
+                      help='attach a StatsLogger to the pool')
+    options, args = parser.parse_args()
+
+    print "%8s %20s" % ("threads", "checkouts/sec")
+    for threads in map(int, options.threads.split(',')):
+        rate = run(threads, options.pool_size, options.seconds,
+                   options.threadlocal, options.stats)
+        print "%8d %20.0f" % (threads, rate)
+
+
+if __name__ == '__main__':
+    main()
@@ -63,6 +63,7 @@ Calls to :meth:`insert` and :meth:`remove` can also be chained:
 """
 
 import threading
+import time
 from pycassa.cassandra.ttypes import (ConsistencyLevel, Deletion, Mutation, SlicePredicate)
 
 __all__ = ['Mutator', 'CfMutator']
@@ -110,26 +111,46 @@ class Mutator(object):
             self._lock.release()
         return self
 
-    def send(self, write_consistency_level=None):
-        """ Sends all operations currently in the batch and clears the batch. """
+    def send(self, write_consistency_level=None, timeout=None):
+        """
+        Sends all operations currently in the batch and clears the batch.
+
+        If `timeout` is set, the batch must be sent within that many
+        seconds, including waiting for a connection and any retries, or
+        :exc:`~pycassa.pool.DeadlineExceeded` will be raised.
+        """
         if write_consistency_level is None:
             write_consistency_level = self.write_consistency_level
+        deadline = None if timeout is None else time.time() + timeout
         mutations = {}
-        conn = None
         self._lock.acquire()
         try:
             for key, column_family, cols in self._buffer:
                 mutations.setdefault(key, {}).setdefault(column_family, []).extend(cols)
             if mutations:
-                conn = self.pool.get()
-                conn.batch_mutate(mutations, write_consistency_level,
-                                  allow_retries=self.allow_retries)
+                tracer = getattr(self.pool, 'tracer', None)
+                if tracer is None:
+                    self._send(mutations, write_consistency_level, deadline)
+                else:
+                    with tracer.span('Mutator.send',
+                                     {'db.system': 'cassandra',
+                                      'db.name': self.pool.keyspace,
+                                      'db.operation': 'batch_mutate',
+                                      'pycassa.mutations': len(mutations)}):
+                        self._send(mutations, write_consistency_level, deadline)
             self._buffer = []
         finally:
-            if conn:
-                conn.return_to_pool()
             self._lock.release()
 
+    def _send(self, mutations, write_consistency_level, deadline):
+        conn = self.pool.get(deadline)
+        try:
+            conn.batch_mutate(mutations, write_consistency_level,
+                              allow_retries=self.allow_retries,
+                              deadline=deadline)
+        finally:
+            conn.return_to_pool()
+
     def insert(self, column_family, key, columns, timestamp=None, ttl=None):
         """
         Adds a single row insert to the batch.
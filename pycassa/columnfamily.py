@@ -5,8 +5,12 @@ manipulation of data inside Cassandra.
 .. seealso:: :mod:`pycassa.columnfamilymap`
 """
 
+import sys
 import time
 import struct
+import threading
+import Queue
+from collections import Mapping
 from UserDict import DictMixin
 
 from pycassa.cassandra.ttypes import Column, ColumnOrSuperColumn,\
@@ -16,12 +20,13 @@ from pycassa.cassandra.ttypes import Column, ColumnOrSuperColumn,\
 import pycassa.marshal as marshal
 import pycassa.types as types
 from pycassa.batch import CfMutator
+from pycassa.tracing import _cf_span, _traced
 try:
     from collections import OrderedDict
 except ImportError:
     from pycassa.util import OrderedDict # NOQA
 
-__all__ = ['gm_timestamp', 'ColumnFamily', 'PooledColumnFamily']
+__all__ = ['gm_timestamp', 'ColumnFamily', 'PooledColumnFamily', 'LazyRow']
 
 class ColumnValidatorDict(DictMixin):
 
@@ -60,6 +65,147 @@ class ColumnValidatorDict(DictMixin):
     def keys(self):
         return map(self.name_unpacker, self.type_map.keys())
 
+_MISSING = object()
+
+class LazyRow(object):
+    """
+    A read-only, dictionary-like row that holds the raw Thrift columns
+    and only unpacks a column name or value when it is accessed.
+    Unpacked names and values are cached, and iteration follows the
+    order of the columns that Cassandra returned.
+
+    These are returned by :meth:`ColumnFamily.get_range()` and
+    :meth:`ColumnFamily.multiget()` when ``lazy=True`` is passed.
+    """
+
+    __slots__ = ('_cf', '_coscs', '_include_timestamp', '_include_ttl',
+                 '_names', '_values', '_positions')
+
+    def __init__(self, column_family, list_col_or_super,
+                 include_timestamp=False, include_ttl=False):
+        self._cf = column_family
+        self._coscs = list_col_or_super
+        self._include_timestamp = include_timestamp
+        self._include_ttl = include_ttl
+        self._names = None
+        self._values = None
+        self._positions = None
+
+    def _is_super(self):
+        cosc = self._coscs[0]
+        return cosc.super_column is not None or cosc.counter_super_column is not None
+
+    def _raw_name(self, i):
+        cosc = self._coscs[i]
+        col = cosc.column or cosc.counter_column or cosc.super_column or \
+              cosc.counter_super_column
+        return col.name
+
+    def _name(self, i):
+        names = self._names
+        if names is None:
+            names = self._names = [_MISSING] * len(self._coscs)
+        name = names[i]
+        if name is _MISSING:
+            name = names[i] = self._cf._unpack_name(self._raw_name(i), self._is_super())
+        return name
+
+    def _value(self, i):
+        values = self._values
+        if values is None:
+            values = self._values = [_MISSING] * len(self._coscs)
+        value = values[i]
+        if value is _MISSING:
+            cf = self._cf
+            cosc = self._coscs[i]
+            if cosc.column:
+                value = cf._col_to_dict(cosc.column, self._include_timestamp, self._include_ttl)
+            elif cosc.counter_column:
+                value = cosc.counter_column.value
+            elif cosc.super_column:
+                value = cf._scol_to_dict(cosc.super_column, self._include_timestamp, self._include_ttl)
+            else:
+                value = cf._scounter_to_dict(cosc.counter_super_column)
+            values[i] = value
+        return value
+
+    def _position(self, name):
+        if not self._coscs:
+            raise KeyError(name)
+        positions = self._positions
+        if positions is None:
+            # Index by the packed names so that lookups don't
+            # require unpacking any of the other column names
+            positions = self._positions = dict(
+                    (self._raw_name(i), i) for i in xrange(len(self._coscs)))
+        try:
+            packed_name = self._cf._pack_name(name, self._is_super())
+        except TypeError:
+            raise KeyError(name)
+        return positions[packed_name]
+
+    def __getitem__(self, name):
+        return self._value(self._position(name))
+
+    def get(self, name, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def __contains__(self, name):
+        try:
+            self._position(name)
+        except KeyError:
+            return False
+        return True
+
+    has_key = __contains__
+
+    def __len__(self):
+        return len(self._coscs)
+
+    def __iter__(self):
+        for i in xrange(len(self._coscs)):
+            yield self._name(i)
+
+    iterkeys = __iter__
+
+    def itervalues(self):
+        for i in xrange(len(self._coscs)):
+            yield self._value(i)
+
+    def iteritems(self):
+        for i in xrange(len(self._coscs)):
+            yield (self._name(i), self._value(i))
+
+    def keys(self):
+        return list(self.iterkeys())
+
+    def values(self):
+        return list(self.itervalues())
+
+    def items(self):
+        return list(self.iteritems())
+
+    def __eq__(self, other):
+        if not isinstance(other, Mapping):
+            return NotImplemented
+        return dict(self.iteritems()) == dict(other.items())
+
+    def __ne__(self, other):
+        eq = self.__eq__(other)
+        if eq is NotImplemented:
+            return eq
+        return not eq
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, self.items())
+
+Mapping.register(LazyRow)
+
 def gm_timestamp():
     """ Returns the number of microseconds since the Unix Epoch. """
     return int(time.time() * 1e6)
@@ -140,10 +286,12 @@ class ColumnFamily(object):
             self._column_name_class = t
             self._name_packer = t.pack
             self._name_unpacker = t.unpack
+            self._bulk_name_packer = marshal.bulk_packer_for(cassandra_type=t)
         else:
             self._column_name_class = marshal.extract_type_name(t)
             self._name_packer = marshal.packer_for(t)
             self._name_unpacker = marshal.unpacker_for(t)
+            self._bulk_name_packer = marshal.bulk_packer_for(t)
 
     def _get_column_name_class(self):
         return self._column_name_class
@@ -181,11 +329,13 @@ class ColumnFamily(object):
             self._default_validation_class = t
             self._default_value_packer = t.pack
             self._default_value_unpacker = t.unpack
+            self._bulk_value_packer = marshal.bulk_packer_for(cassandra_type=t)
             self._have_counters = isinstance(t, types.CounterColumnType)
         else:
             self._default_validation_class = marshal.extract_type_name(t)
             self._default_value_packer = marshal.packer_for(t)
             self._default_value_unpacker = marshal.unpacker_for(t)
+            self._bulk_value_packer = marshal.bulk_packer_for(t)
             self._have_counters = self._default_validation_class == "CounterColumnType"
 
         if not self.super:
@@ -301,9 +451,12 @@ class ColumnFamily(object):
         Loads the schema definition for this column family from
         Cassandra and updates comparator and validation classes if
         neccessary.
+
+        The keyspace description is shared with other column families
+        through the pool's schema cache; see
+        :attr:`.ConnectionPool.schema_cache`.
         """
-        ksdef = self.pool.execute('get_keyspace_description',
-                                  use_dict_for_col_metadata=True)
+        ksdef = self.pool.get_keyspace_description()
         try:
             self._cfdef = ksdef[self.column_family]
         except KeyError:
@@ -377,6 +530,56 @@ class ColumnFamily(object):
                 ret[self._unpack_name(scounter.name, True)] = self._scounter_to_dict(scounter)
         return ret
 
+    def _columnar_unpacker(self, data_type, unpacker, autopack):
+        if not autopack:
+            return marshal.columnar_unpacker_for(None)
+        if isinstance(data_type, types.CassandraType):
+            cls = data_type.__class__
+            if cls.__module__ == types.__name__ and cls.__name__ in marshal._BASIC_TYPES:
+                return marshal.columnar_unpacker_for(cls.__name__)
+            return marshal.columnar_unpacker_for(None, unpacker=unpacker)
+        return marshal.columnar_unpacker_for(data_type)
+
+    def _columnar_converter(self):
+        """
+        Returns a function that converts a list of ColumnOrSuperColumns
+        into a ``(names, values, timestamps)`` tuple of numpy arrays.
+        """
+        import numpy
+
+        unpack_names = self._columnar_unpacker(self._column_name_class,
+                self._name_unpacker, self.autopack_names)
+        if self._column_validators.unpackers and self.autopack_values:
+            # Values may not share a single type, so unpack them one by one
+            unpack_value = self._unpack_value
+
+            def unpack_values(columns):
+                arr = numpy.empty(len(columns), dtype=object)
+                for i, col in enumerate(columns):
+                    arr[i] = unpack_value(col.value, col.name)
+                return arr
+        else:
+            unpack_raw = self._columnar_unpacker(self._default_validation_class,
+                    self._default_value_unpacker, self.autopack_values)
+            unpack_values = lambda columns: unpack_raw([c.value for c in columns])
+
+        if self._have_counters:
+            def to_arrays(list_cosc):
+                counters = [cosc.counter_column for cosc in list_cosc]
+                names = unpack_names([c.name for c in counters])
+                values = numpy.fromiter((c.value for c in counters),
+                                        dtype=numpy.int64, count=len(counters))
+                return (names, values, None)
+        else:
+            def to_arrays(list_cosc):
+                columns = [cosc.column for cosc in list_cosc]
+                names = unpack_names([c.name for c in columns])
+                timestamps = numpy.fromiter((c.timestamp for c in columns),
+                                            dtype=numpy.int64, count=len(columns))
+                return (names, unpack_values(columns), timestamps)
+
+        return to_arrays
+
     def _column_path(self, super_column=None, column=None):
         return ColumnPath(self.column_family,
                           self._pack_name(super_column, is_supercol_name=True),
@@ -470,6 +673,46 @@ class ColumnFamily(object):
             raise TypeError("%s is not a compatible type for %s" %
                             (value.__class__.__name__, d_type))
 
+    def _pack_names(self, names):
+        """
+        Packs a list of (non-super) column names, using a single
+        bulk packing call where possible.
+        """
+        if self.autopack_names and None not in names:
+            try:
+                return self._bulk_name_packer(names)
+            except struct.error:
+                # Let _pack_name() find the bad name and raise a TypeError
+                pass
+        return map(self._pack_name, names)
+
+    def _pack_values(self, values, names, packed_names):
+        """
+        Packs a list of column values, where `names` and `packed_names`
+        are the corresponding column names.
+        """
+        if not self.autopack_values or None in values:
+            return map(self._pack_value, values, names)
+
+        packers = self._column_validators.packers
+        if not packers or not [n for n in packed_names if n in packers]:
+            try:
+                return self._bulk_value_packer(values)
+            except struct.error:
+                pass
+
+        packed_values = []
+        default_packer = self._default_value_packer
+        for value, name, packed_name in zip(values, names, packed_names):
+            packer = packers.get(packed_name, default_packer)
+            try:
+                packed_values.append(packer(value))
+            except struct.error:
+                d_type = self.column_validators.get(name, self._default_validation_class)
+                raise TypeError("%s is not a compatible type for %s" %
+                                (value.__class__.__name__, d_type))
+        return packed_values
+
     def _unpack_value(self, value, col_name):
         if not self.autopack_values:
             return value
@@ -502,35 +745,37 @@ class ColumnFamily(object):
                             (b, d_type))
 
     def _make_mutation_list(self, columns, timestamp, ttl):
-        _pack_name = self._pack_name
-        _pack_value = self._pack_value
         if not self.super:
-            return map(lambda (c, v): Mutation(self._make_cosc(_pack_name(c), _pack_value(v, c), timestamp, ttl)),
-                       columns.iteritems())
+            names = columns.keys()
+            values = columns.values()
+            packed_names = self._pack_names(names)
+            packed_values = self._pack_values(values, names, packed_names)
+            make_cosc = self._make_cosc
+            return [Mutation(make_cosc(n, v, timestamp, ttl))
+                    for n, v in zip(packed_names, packed_values)]
         else:
             mut_list = []
             for super_col, subcs in columns.items():
-                subcols = map(lambda (c, v): self._make_column(_pack_name(c), _pack_value(v, c), timestamp, ttl),
-                              subcs.iteritems())
-                mut_list.append(Mutation(self._make_cosc(_pack_name(super_col, True), subcols)))
+                names = subcs.keys()
+                values = subcs.values()
+                packed_names = self._pack_names(names)
+                packed_values = self._pack_values(values, names, packed_names)
+                subcols = [self._make_column(n, v, timestamp, ttl)
+                           for n, v in zip(packed_names, packed_values)]
+                mut_list.append(Mutation(self._make_cosc(self._pack_name(super_col, True), subcols)))
             return mut_list
 
-    def xget(self, key, column_start="", column_finish="", column_reversed=False,
-             column_count=None, include_timestamp=False, read_consistency_level=None,
-             buffer_size=None, include_ttl=False):
+    def _xget_pages(self, operation, key, column_start, column_finish,
+                    column_reversed, column_count, read_consistency_level,
+                    buffer_size, timeout):
         """
-        Like :meth:`get()`, but creates a generator that pages over the columns
-        automatically.
-
-        The number of columns fetched at once can be controlled with the
-        `buffer_size` parameter. The default is :attr:`column_buffer_size`.
-
-        The generator returns `(name, value)` tuples.
+        Pages over a row, yielding lists of the raw
+        :class:`~pycassa.cassandra.ttypes.ColumnOrSuperColumn` objects.
         """
-
         packed_key = self._pack_key(key)
         cp = self._column_parent(None)
         rcl = read_consistency_level or self.read_consistency_level
+        deadline = None if timeout is None else time.time() + timeout
 
         if buffer_size is None:
             buffer_size = self.column_buffer_size
@@ -555,31 +800,22 @@ class ColumnFamily(object):
 
             sp = self._slice_predicate(None, last_name, finish,
                                        column_reversed, buffer_size, None, pack=False)
-            list_cosc = self.pool.execute('get_slice', packed_key, cp, sp, rcl)
+            with _cf_span(self, operation, page=i):
+                list_cosc = self.pool.execute('get_slice', packed_key, cp, sp, rcl,
+                                              deadline=deadline)
 
             if not list_cosc:
                 return
 
-            for j, cosc in enumerate(list_cosc):
-                if j == 0 and i != 0:
-                    continue
-
-                if self.super:
-                    if self._have_counters:
-                        scol = cosc.counter_super_column
-                    else:
-                        scol = cosc.super_column
-                    yield (self._unpack_name(scol.name, True), self._scol_to_dict(scol, include_timestamp, include_ttl))
-                else:
-                    if self._have_counters:
-                        col = cosc.counter_column
-                    else:
-                        col = cosc.column
-                    yield (self._unpack_name(col.name, False), self._col_to_dict(col, include_timestamp, include_ttl))
-
-                count += 1
-                if column_count is not None and count >= column_count:
-                    return
+            # Skip the first column after the first page because
+            # it will be a duplicate.
+            page = list_cosc if i == 0 else list_cosc[1:]
+            if column_count is not None and count + len(page) >= column_count:
+                yield page[:column_count - count]
+                return
+            if page:
+                yield page
+            count += len(page)
 
             if len(list_cosc) != buffer_size:
                 return
@@ -596,9 +832,73 @@ class ColumnFamily(object):
                     last_name = list_cosc[-1].column.name
             i += 1
 
+    def xget(self, key, column_start="", column_finish="", column_reversed=False,
+             column_count=None, include_timestamp=False, read_consistency_level=None,
+             buffer_size=None, include_ttl=False, timeout=None):
+        """
+        Like :meth:`get()`, but creates a generator that pages over the columns
+        automatically.
+
+        The number of columns fetched at once can be controlled with the
+        `buffer_size` parameter. The default is :attr:`column_buffer_size`.
+
+        `timeout` applies to all of the pages together, counting from when
+        iteration begins.
+
+        The generator returns `(name, value)` tuples.
+        """
+
+        pages = self._xget_pages('xget', key, column_start, column_finish,
+                                 column_reversed, column_count,
+                                 read_consistency_level, buffer_size, timeout)
+        for list_cosc in pages:
+            for cosc in list_cosc:
+                if self.super:
+                    if self._have_counters:
+                        scol = cosc.counter_super_column
+                    else:
+                        scol = cosc.super_column
+                    yield (self._unpack_name(scol.name, True), self._scol_to_dict(scol, include_timestamp, include_ttl))
+                else:
+                    if self._have_counters:
+                        col = cosc.counter_column
+                    else:
+                        col = cosc.column
+                    yield (self._unpack_name(col.name, False), self._col_to_dict(col, include_timestamp, include_ttl))
+
+    def xget_columnar(self, key, column_start="", column_finish="",
+                      column_reversed=False, column_count=None,
+                      read_consistency_level=None, buffer_size=None, timeout=None):
+        """
+        Like :meth:`xget()`, but each page of columns is returned as a
+        ``(names, values, timestamps)`` tuple of :class:`numpy.ndarray` objects
+        instead of one ``(name, value)`` tuple per column.
+
+        Names and values of fixed-width types, such as ``LongType``,
+        ``DoubleType``, ``DateType`` or ``TimeUUIDType``, are decoded straight
+        from the packed bytes into numeric arrays; see
+        :func:`~pycassa.marshal.columnar_unpacker_for()`.  Other types
+        produce arrays of objects.  For counter column families, `timestamps`
+        is ``None``.
+
+        numpy must be installed to use this.  Super column families are
+        not supported.
+        """
+        assert not self.super, "xget_columnar() is not " \
+                "supported by super column families"
+
+        to_arrays = self._columnar_converter()
+        pages = self._xget_pages('xget_columnar', key, column_start, column_finish,
+                                 column_reversed, column_count,
+                                 read_consistency_level, buffer_size, timeout)
+        for list_cosc in pages:
+            yield to_arrays(list_cosc)
+
+    @_traced
     def get(self, key, columns=None, column_start="", column_finish="",
             column_reversed=False, column_count=100, include_timestamp=False,
-            super_column=None, read_consistency_level=None, include_ttl=False):
+            super_column=None, read_consistency_level=None, include_ttl=False,
+            timeout=None):
         """
         Fetches all or part of the row with key `key`.
 
@@ -636,6 +936,10 @@ class ColumnFamily(object):
         the super column name will be excluded and the results are of the form
         ``{column_name: column_value}``.
 
+        If `timeout` is set, the request must complete within that many
+        seconds, including any retries, or
+        :exc:`~pycassa.pool.DeadlineExceeded` will be raised.
+
         """
 
         packed_key = self._pack_key(key)
@@ -649,7 +953,8 @@ class ColumnFamily(object):
                 column = columns[0]
             cp = self._column_path(super_column, column)
             col_or_super = self.pool.execute('get', packed_key, cp,
-                    read_consistency_level or self.read_consistency_level)
+                    read_consistency_level or self.read_consistency_level,
+                    timeout=timeout)
             return self._cosc_to_dict([col_or_super], include_timestamp, include_ttl)
         else:
             cp = self._column_parent(super_column)
@@ -657,7 +962,8 @@ class ColumnFamily(object):
                                        column_reversed, column_count, super_column)
 
             list_col_or_super = self.pool.execute('get_slice', packed_key, cp, sp,
-                read_consistency_level or self.read_consistency_level)
+                read_consistency_level or self.read_consistency_level,
+                timeout=timeout)
 
             if len(list_col_or_super) == 0:
                 raise NotFoundException()
@@ -665,7 +971,8 @@ class ColumnFamily(object):
 
     def get_indexed_slices(self, index_clause, columns=None, column_start="", column_finish="",
                            column_reversed=False, column_count=100, include_timestamp=False,
-                           read_consistency_level=None, buffer_size=None, include_ttl=False):
+                           read_consistency_level=None, buffer_size=None, include_ttl=False,
+                           timeout=None):
         """
         Similar to :meth:`get_range()`, but an :class:`~pycassa.cassandra.ttypes.IndexClause`
         is used instead of a key range.
@@ -677,6 +984,9 @@ class ColumnFamily(object):
         Note that Cassandra does not support secondary indexes or get_indexed_slices()
         for super column families.
 
+        `timeout` applies to all of the pages together, counting from when
+        iteration begins.
+
             .. seealso:: :meth:`~pycassa.index.create_index_clause()` and
                          :meth:`~pycassa.index.create_index_expression()`
 
@@ -686,6 +996,7 @@ class ColumnFamily(object):
                 "supported by super column families"
 
         cl = read_consistency_level or self.read_consistency_level
+        deadline = None if timeout is None else time.time() + timeout
         cp = self._column_parent()
         sp = self._slice_predicate(columns, column_start, column_finish,
                                    column_reversed, column_count)
@@ -717,7 +1028,9 @@ class ColumnFamily(object):
                     buffer_size = min(row_count - count + 1, buffer_size)
             clause.count = buffer_size
             clause.start_key = last_key
-            key_slices = self.pool.execute('get_indexed_slices', cp, clause, sp, cl)
+            with _cf_span(self, 'get_indexed_slices', page=i):
+                key_slices = self.pool.execute('get_indexed_slices', cp, clause, sp, cl,
+                                               deadline=deadline)
 
             if key_slices is None:
                 return
@@ -739,9 +1052,11 @@ class ColumnFamily(object):
             last_key = key_slices[-1].key
             i += 1
 
+    @_traced
     def multiget(self, keys, columns=None, column_start="", column_finish="",
                  column_reversed=False, column_count=100, include_timestamp=False,
-                 super_column=None, read_consistency_level=None, buffer_size=None, include_ttl=False):
+                 super_column=None, read_consistency_level=None, buffer_size=None, include_ttl=False,
+                 lazy=False, timeout=None):
         """
         Fetch multiple rows from a Cassandra server.
 
@@ -750,56 +1065,126 @@ class ColumnFamily(object):
         `buffer_size` is the number of rows from the total list to fetch at a time.
         If left as ``None``, the ColumnFamily's :attr:`buffer_size` will be used.
 
+        If `lazy` is ``True``, each row is returned as a :class:`LazyRow`;
+        see :meth:`get_range()`.
+
         All other parameters are the same as :meth:`get()`, except that a list of keys may
-        be passed in.
+        be passed in.  `timeout` applies to all of the chunks together.
 
         Results will be returned in the form: ``{key: {column_name: column_value}}``. If
         an OrderedDict is used, the rows will have the same order as `keys`.
 
         """
 
+        rows = self.xmultiget(keys, columns, column_start, column_finish,
+                              column_reversed, column_count, include_timestamp,
+                              super_column, read_consistency_level, buffer_size,
+                              include_ttl, lazy, timeout=timeout)
+        ret = self.dict_class()
+        for key, row in rows:
+            ret[key] = row
+        return ret
+
+    def xmultiget(self, keys, columns=None, column_start="", column_finish="",
+                  column_reversed=False, column_count=100, include_timestamp=False,
+                  super_column=None, read_consistency_level=None, buffer_size=None,
+                  include_ttl=False, lazy=False, concurrency=1, timeout=None):
+        """
+        Like :meth:`multiget()`, but creates a generator over
+        ``(key, {column_name: column_value})`` tuples that yields the rows
+        of each chunk of `buffer_size` keys as soon as that chunk has been
+        fetched.  Only one chunk of raw results is held in memory at a time.
+        Rows that do not exist are skipped.
+
+        If `concurrency` is greater than one, up to that many chunks will be
+        fetched in parallel, each by a separate thread with its own
+        connection from the pool.  Rows are then yielded in the order that
+        the chunks complete, not in the order of `keys`, and no more than
+        `concurrency` fetched chunks will be waiting to be consumed at once.
+
+        All other parameters are the same as those of :meth:`multiget()`.
+
+        """
+
         packed_keys = map(self._pack_key, keys)
         cp = self._column_parent(super_column)
         sp = self._slice_predicate(columns, column_start, column_finish,
                                    column_reversed, column_count, super_column)
         consistency = read_consistency_level or self.read_consistency_level
+        deadline = None if timeout is None else time.time() + timeout
 
         buffer_size = buffer_size or self.buffer_size
-        offset = 0
-        keymap = {}
-        while offset < len(packed_keys):
-            new_keymap = self.pool.execute('multiget_slice',
-                packed_keys[offset:offset + buffer_size], cp, sp, consistency)
-            keymap.update(new_keymap)
-            offset += buffer_size
-
-        ret = self.dict_class()
-
-        # Keep the order of keys
-        for key in keys:
-            ret[key] = None
+        offsets = range(0, len(packed_keys), buffer_size)
+
+        def fetch(offset):
+            with _cf_span(self, 'xmultiget', page=offset // buffer_size):
+                return self.pool.execute('multiget_slice',
+                    packed_keys[offset:offset + buffer_size], cp, sp, consistency,
+                    deadline=deadline)
+
+        def chunk_rows(offset, keymap):
+            # Follow the order of keys within the chunk; popping each
+            # row from the keymap also skips duplicate keys
+            for packed_key in packed_keys[offset:offset + buffer_size]:
+                columns = keymap.pop(packed_key, None)
+                if columns:
+                    if lazy:
+                        row = LazyRow(self, columns, include_timestamp, include_ttl)
+                    else:
+                        row = self._cosc_to_dict(columns, include_timestamp, include_ttl)
+                    yield (self._unpack_key(packed_key), row)
 
-        empty_keys = []
-        for packed_key, columns in keymap.iteritems():
-            unpacked_key = self._unpack_key(packed_key)
-            if len(columns) > 0:
-                ret[unpacked_key] = self._cosc_to_dict(columns, include_timestamp, include_ttl)
-            else:
-                empty_keys.append(unpacked_key)
+        if concurrency <= 1 or len(offsets) <= 1:
+            for offset in offsets:
+                for item in chunk_rows(offset, fetch(offset)):
+                    yield item
+            return
 
-        for key in empty_keys:
-            try:
-                del ret[key]
-            except KeyError:
-                pass
+        pending = Queue.Queue()
+        for offset in offsets:
+            pending.put(offset)
+        results = Queue.Queue(concurrency)
+        stop = threading.Event()
+
+        def worker():
+            while not stop.isSet():
+                try:
+                    offset = pending.get_nowait()
+                except Queue.Empty:
+                    return
+                try:
+                    result = (offset, fetch(offset), None)
+                except Exception:
+                    result = (offset, None, sys.exc_info())
+                # Don't block forever if the generator has been closed
+                while not stop.isSet():
+                    try:
+                        results.put(result, timeout=0.1)
+                        break
+                    except Queue.Full:
+                        pass
+
+        for i in range(min(concurrency, len(offsets))):
+            thread = threading.Thread(target=worker)
+            thread.setDaemon(True)
+            thread.start()
 
-        return ret
+        try:
+            for i in range(len(offsets)):
+                offset, keymap, exc_info = results.get()
+                if exc_info is not None:
+                    raise exc_info[0], exc_info[1], exc_info[2]
+                for item in chunk_rows(offset, keymap):
+                    yield item
+        finally:
+            stop.set()
 
     MAX_COUNT = 2 ** 31 - 1
 
+    @_traced
     def get_count(self, key, super_column=None, read_consistency_level=None,
                   columns=None, column_start="", column_finish="",
-                  column_reversed=False, max_count=None):
+                  column_reversed=False, max_count=None, timeout=None):
         """
         Count the number of columns in the row with key `key`.
 
@@ -824,13 +1209,15 @@ class ColumnFamily(object):
                                    column_reversed, max_count, super_column)
 
         return self.pool.execute('get_count', packed_key, cp, sp,
-                read_consistency_level or self.read_consistency_level)
+                read_consistency_level or self.read_consistency_level,
+                timeout=timeout)
 
+    @_traced
     def multiget_count(self, keys, super_column=None,
                        read_consistency_level=None,
                        columns=None, column_start="",
                        column_finish="", buffer_size=None,
-                       column_reversed=False, max_count=None):
+                       column_reversed=False, max_count=None, timeout=None):
         """
         Perform a column count in parallel on a set of rows.
 
@@ -853,13 +1240,15 @@ class ColumnFamily(object):
         sp = self._slice_predicate(columns, column_start, column_finish,
                                    column_reversed, max_count, super_column)
         consistency = read_consistency_level or self.read_consistency_level
+        deadline = None if timeout is None else time.time() + timeout
 
         buffer_size = buffer_size or self.buffer_size
         offset = 0
         keymap = {}
         while offset < len(packed_keys):
             new_keymap = self.pool.execute('multiget_count',
-                packed_keys[offset:offset + buffer_size], cp, sp, consistency)
+                packed_keys[offset:offset + buffer_size], cp, sp, consistency,
+                deadline=deadline)
             keymap.update(new_keymap)
             offset += buffer_size
 
@@ -879,7 +1268,7 @@ class ColumnFamily(object):
                   row_count=None, include_timestamp=False,
                   super_column=None, read_consistency_level=None,
                   buffer_size=None, filter_empty=True, include_ttl=False,
-                  start_token=None, finish_token=None):
+                  start_token=None, finish_token=None, lazy=False, timeout=None):
         """
         Get an iterator over rows in a specified key range.
 
@@ -914,6 +1303,14 @@ class ColumnFamily(object):
         `range ghosts <http://wiki.apache.org/cassandra/FAQ#range_ghosts>`_)
         will be skipped and will not count towards `row_count`.
 
+        If `lazy` is ``True``, each row is returned as a :class:`LazyRow`
+        instead of a :attr:`dict_class` instance.  Column names and values are
+        then only unpacked when they are accessed, which is cheaper when only
+        a few of the fetched columns are used.
+
+        `timeout` applies to all of the pages together, counting from when
+        iteration begins.
+
         All other parameters are the same as those of :meth:`get()`.
 
         A generator over ``(key, {column_name: column_value})`` is returned.
@@ -921,7 +1318,57 @@ class ColumnFamily(object):
 
         """
 
+        key_slices = self._get_range_slices('get_range', start, finish, columns,
+                column_start, column_finish, column_reversed, column_count, row_count,
+                super_column, read_consistency_level, buffer_size,
+                filter_empty, start_token, finish_token, timeout)
+        if lazy:
+            for key_slice in key_slices:
+                yield (self._unpack_key(key_slice.key),
+                       LazyRow(self, key_slice.columns, include_timestamp, include_ttl))
+        else:
+            for key_slice in key_slices:
+                yield (self._unpack_key(key_slice.key),
+                       self._cosc_to_dict(key_slice.columns, include_timestamp, include_ttl))
+
+    def get_range_columnar(self, start="", finish="", columns=None, column_start="",
+                           column_finish="", column_reversed=False, column_count=100,
+                           row_count=None, read_consistency_level=None,
+                           buffer_size=None, filter_empty=True,
+                           start_token=None, finish_token=None, timeout=None):
+        """
+        Like :meth:`get_range()`, but the columns of each row are returned
+        as a ``(names, values, timestamps)`` tuple of :class:`numpy.ndarray`
+        objects, as with :meth:`xget_columnar()`.
+
+        A generator over ``(key, (names, values, timestamps))`` is returned.
+
+        numpy must be installed to use this.  Super column families are
+        not supported.
+        """
+        assert not self.super, "get_range_columnar() is not " \
+                "supported by super column families"
+
+        to_arrays = self._columnar_converter()
+        key_slices = self._get_range_slices('get_range_columnar', start, finish,
+                columns, column_start, column_finish, column_reversed, column_count,
+                row_count, None, read_consistency_level, buffer_size,
+                filter_empty, start_token, finish_token, timeout)
+        for key_slice in key_slices:
+            yield (self._unpack_key(key_slice.key), to_arrays(key_slice.columns))
+
+    def _get_range_slices(self, operation, start, finish, columns, column_start,
+                          column_finish, column_reversed, column_count,
+                          row_count, super_column, read_consistency_level,
+                          buffer_size, filter_empty, start_token, finish_token,
+                          timeout):
+        """
+        Pages over a key range, yielding the raw
+        :class:`~pycassa.cassandra.ttypes.KeySlice` objects.
+        """
+
         cl = read_consistency_level or self.read_consistency_level
+        deadline = None if timeout is None else time.time() + timeout
         cp = self._column_parent(super_column)
         sp = self._slice_predicate(columns, column_start, column_finish,
                                    column_reversed, column_count, super_column)
@@ -961,7 +1408,9 @@ class ColumnFamily(object):
                     buffer_size = min(row_count - count + 1, buffer_size)
             kr_args['count'] = buffer_size
             key_range = KeyRange(**kr_args)
-            key_slices = self.pool.execute('get_range_slices', cp, sp, key_range, cl)
+            with _cf_span(self, operation, page=i):
+                key_slices = self.pool.execute('get_range_slices', cp, sp, key_range, cl,
+                                               deadline=deadline)
             # This may happen if nothing was ever inserted
             if key_slices is None:
                 return
@@ -972,8 +1421,7 @@ class ColumnFamily(object):
                     continue
                 if filter_empty and not key_slice.columns:
                     continue
-                yield (self._unpack_key(key_slice.key),
-                       self._cosc_to_dict(key_slice.columns, include_timestamp, include_ttl))
+                yield key_slice
                 count += 1
                 if row_count is not None and count >= row_count:
                     return
@@ -985,8 +1433,9 @@ class ColumnFamily(object):
             kr_args['start_key'] = key_slices[-1].key
             i += 1
 
+    @_traced
     def insert(self, key, columns, timestamp=None, ttl=None,
-               write_consistency_level=None):
+               write_consistency_level=None, timeout=None):
         """
         Insert or update columns in the row with key `key`.
 
@@ -1006,6 +1455,8 @@ class ColumnFamily(object):
 
         The timestamp Cassandra reports as being used for insert is returned.
 
+        `timeout` is the same as for :meth:`get()`.
+
         """
         if timestamp is None:
             timestamp = self.timestamp()
@@ -1015,11 +1466,13 @@ class ColumnFamily(object):
         mutations = {packed_key: {self.column_family: mut_list}}
         self.pool.execute('batch_mutate', mutations,
                 write_consistency_level or self.write_consistency_level,
-                allow_retries=self._allow_retries)
+                allow_retries=self._allow_retries, timeout=timeout)
 
         return timestamp
 
-    def batch_insert(self, rows, timestamp=None, ttl=None, write_consistency_level=None):
+    @_traced
+    def batch_insert(self, rows, timestamp=None, ttl=None, write_consistency_level=None,
+                     timeout=None):
         """
         Like :meth:`insert()`, but multiple rows may be inserted at once.
 
@@ -1043,11 +1496,13 @@ class ColumnFamily(object):
         if mutations:
             self.pool.execute('batch_mutate', mutations,
                     write_consistency_level or self.write_consistency_level,
-                    allow_retries=self._allow_retries)
+                    allow_retries=self._allow_retries, timeout=timeout)
 
         return timestamp
 
-    def add(self, key, column, value=1, super_column=None, write_consistency_level=None):
+    @_traced
+    def add(self, key, column, value=1, super_column=None, write_consistency_level=None,
+            timeout=None):
         """
         Increment or decrement a counter.
 
@@ -1063,10 +1518,12 @@ class ColumnFamily(object):
         column = self._pack_name(column)
         self.pool.execute('add', packed_key, cp, CounterColumn(column, value),
                           write_consistency_level or self.write_consistency_level,
-                          allow_retries=self._allow_retries)
+                          allow_retries=self._allow_retries, timeout=timeout)
 
+    @_traced
     def remove(self, key, columns=None, super_column=None,
-               write_consistency_level=None, timestamp=None, counter=None):
+               write_consistency_level=None, timestamp=None, counter=None,
+               timeout=None):
         """
         Remove a specified row or a set of columns within the row with key `key`.
 
@@ -1087,10 +1544,12 @@ class ColumnFamily(object):
             timestamp = self.timestamp()
         batch = self.batch(write_consistency_level=write_consistency_level)
         batch.remove(key, columns, super_column, timestamp)
-        batch.send()
+        batch.send(timeout=timeout)
         return timestamp
 
-    def remove_counter(self, key, column, super_column=None, write_consistency_level=None):
+    @_traced
+    def remove_counter(self, key, column, super_column=None, write_consistency_level=None,
+                       timeout=None):
         """
         Remove a counter at the specified location.
 
@@ -1105,7 +1564,8 @@ class ColumnFamily(object):
         packed_key = self._pack_key(key)
         cp = self._column_path(super_column, column)
         self.pool.execute('remove_counter', packed_key, cp,
-                          write_consistency_level or self.write_consistency_level)
+                          write_consistency_level or self.write_consistency_level,
+                          timeout=timeout)
 
     def batch(self, queue_size=100, write_consistency_level=None):
         """
@@ -1122,6 +1582,7 @@ class ColumnFamily(object):
                          write_consistency_level or self.write_consistency_level,
                          allow_retries=self._allow_retries)
 
+    @_traced
     def truncate(self):
         """
         Marks the entire ColumnFamily as deleted.
@@ -27,6 +27,31 @@ def default_transport_factory(tsocket, host, port):
     return TTransport.TFramedTransport(tsocket)
 
 
+class _ByteCounter(object):
+    """
+    Counts the bytes read from and written to `tsocket` by replacing its
+    ``read()`` and ``write()`` methods on the instance, so that the socket
+    itself can still be handed to the transport factory.
+    """
+
+    def __init__(self, tsocket):
+        self.bytes_written = 0
+        self.bytes_read = 0
+        self._read = tsocket.read
+        self._write = tsocket.write
+        tsocket.read = self.read
+        tsocket.write = self.write
+
+    def read(self, sz):
+        data = self._read(sz)
+        self.bytes_read += len(data)
+        return data
+
+    def write(self, buf):
+        self.bytes_written += len(buf)
+        self._write(buf)
+
+
 class Connection(Cassandra.Client):
     """Encapsulation of a client session."""
 
@@ -45,6 +70,9 @@ class Connection(Cassandra.Client):
         socket = socket_factory(host, int(port))
         if timeout is not None:
             socket.setTimeout(timeout * 1000.0)
+        self._tsocket = socket
+        self._timeout = timeout
+        self._counter = _ByteCounter(socket)
         self.transport = transport_factory(socket, host, port)
         protocol = TBinaryProtocol.TBinaryProtocolAccelerated(self.transport)
         Cassandra.Client.__init__(self, protocol)
@@ -61,6 +89,25 @@ class Connection(Cassandra.Client):
             Cassandra.Client.set_keyspace(self, keyspace)
             self.keyspace = keyspace
 
+    def set_timeout(self, timeout):
+        """
+        Changes the socket timeout, in seconds, of this connection.
+        ``None`` restores the timeout the connection was created with.
+        """
+        if timeout is None:
+            timeout = self._timeout
+        self._tsocket.setTimeout(None if timeout is None else timeout * 1000.0)
+
+    @property
+    def bytes_sent(self):
+        """ The number of bytes written to the socket, including framing. """
+        return self._counter.bytes_written
+
+    @property
+    def bytes_received(self):
+        """ The number of bytes read from the socket, including framing. """
+        return self._counter.bytes_read
+
     def close(self):
         self.transport.close()
 
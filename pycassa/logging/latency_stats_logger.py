@@ -0,0 +1,217 @@
+""" Request latency histograms for connection pools. """
+
+import threading
+
+__all__ = ['LatencyHistogram', 'LatencyStatsLogger']
+
+# Latencies are recorded in microseconds.  Values below _SUB_BUCKETS are
+# counted exactly; above that, each power of two is split into
+# _SUB_BUCKETS / 2 linear buckets, which keeps the relative error of
+# any recorded value under 1 / (_SUB_BUCKETS / 2), about 3%.
+_SUB_BUCKET_BITS = 6
+_SUB_BUCKETS = 1 << _SUB_BUCKET_BITS
+_HALF_SUB_BUCKETS = _SUB_BUCKETS >> 1
+
+# Enough buckets for about twelve days
+_MAX_VALUE = (1 << 40) - 1
+_BUCKETS = (40 - _SUB_BUCKET_BITS + 1) * _HALF_SUB_BUCKETS + _HALF_SUB_BUCKETS
+
+
+def _bucket_index(value):
+    if value < _SUB_BUCKETS:
+        return value
+    # the bit length of value; int.bit_length() needs Python 2.7
+    shift = len(bin(value)) - 2 - _SUB_BUCKET_BITS
+    return (shift + 1) * _HALF_SUB_BUCKETS + (value >> shift) - _HALF_SUB_BUCKETS
+
+
+def _bucket_value(index):
+    """ The highest value that falls in bucket `index`. """
+    if index < _SUB_BUCKETS:
+        return index
+    shift = index // _HALF_SUB_BUCKETS - 1
+    sub_bucket = index % _HALF_SUB_BUCKETS + _HALF_SUB_BUCKETS
+    return ((sub_bucket + 1) << shift) - 1
+
+
+class LatencyHistogram(object):
+    """
+    A histogram of latencies with buckets whose width grows with the
+    latency, in the style of HdrHistogram.  Recording is a constant time
+    operation, the memory used is fixed, and percentiles are accurate to
+    within about 3%.
+
+    Latencies are recorded and reported in seconds.  Every method may be
+    called from any thread.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = [0] * _BUCKETS
+        self._total = 0
+        self._sum = 0
+        self._min = None
+        self._max = 0
+
+    def record(self, seconds):
+        """ Records a single latency of `seconds`. """
+        value = min(max(int(seconds * 1000000), 0), _MAX_VALUE)
+        index = _bucket_index(value)
+        with self._lock:
+            self._counts[index] += 1
+            self._total += 1
+            self._sum += value
+            if self._min is None or value < self._min:
+                self._min = value
+            if value > self._max:
+                self._max = value
+
+    def reset(self):
+        """ Discards every recorded latency. """
+        with self._lock:
+            self._counts = [0] * _BUCKETS
+            self._total = 0
+            self._sum = 0
+            self._min = None
+            self._max = 0
+
+    def copy(self, reset=False):
+        """
+        Returns a consistent copy of this histogram.  If `reset` is ``True``,
+        this histogram is emptied at the same time, so that no latency is
+        lost or counted twice between successive copies.
+        """
+        other = LatencyHistogram()
+        with self._lock:
+            if reset:
+                other._counts = self._counts
+                self._counts = [0] * _BUCKETS
+            else:
+                other._counts = list(self._counts)
+            other._total, other._sum = self._total, self._sum
+            other._min, other._max = self._min, self._max
+            if reset:
+                self._total = self._sum = self._max = 0
+                self._min = None
+        return other
+
+    @property
+    def count(self):
+        """ The number of latencies recorded. """
+        return self._total
+
+    def percentile(self, percentile):
+        """
+        Returns the latency, in seconds, that `percentile` percent of
+        the recorded latencies are at or below, or ``None`` if nothing
+        has been recorded.
+        """
+        with self._lock:
+            total = self._total
+            if not total:
+                return None
+            target = max(1, int(round(total * percentile / 100.0)))
+            seen = 0
+            for index, count in enumerate(self._counts):
+                seen += count
+                if seen >= target:
+                    return min(_bucket_value(index), self._max) / 1000000.0
+            return self._max / 1000000.0
+
+    def summary(self):
+        """
+        Returns a dictionary with the `count`, `min`, `max` and `mean`
+        latencies, and the `p50`, `p90`, `p99` and `p999` percentiles.
+        Latencies are in seconds.
+        """
+        snapshot = self.copy()
+        if not snapshot._total:
+            return {'count': 0, 'min': None, 'max': None, 'mean': None,
+                    'p50': None, 'p90': None, 'p99': None, 'p999': None}
+        return {'count': snapshot._total,
+                'min': snapshot._min / 1000000.0,
+                'max': snapshot._max / 1000000.0,
+                'mean': snapshot._sum / float(snapshot._total) / 1000000.0,
+                'p50': snapshot.percentile(50),
+                'p90': snapshot.percentile(90),
+                'p99': snapshot.percentile(99),
+                'p999': snapshot.percentile(99.9)}
+
+
+class LatencyStatsLogger(object):
+    """
+    A pool listener that keeps a :class:`LatencyHistogram` of the time
+    taken by each attempt at a Thrift call, grouped both by Thrift method
+    (``get_slice``, ``batch_mutate``, ...) and by server.  Attempts that
+    failed are counted separately in `errors`.
+
+    Usage::
+
+        >>> latencies = LatencyStatsLogger()
+        >>> pool = ConnectionPool(..., listeners=[latencies])
+        >>>
+        >>> # use the pool for a while, then from a metrics thread:
+        >>> snapshot = latencies.snapshot(reset=True)
+        >>> snapshot['methods']['get_slice']['p99']
+        0.0042
+
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._methods = {}
+        self._servers = {}
+        self._errors = {}
+
+    def _histogram(self, histograms, key):
+        histogram = histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = histograms.setdefault(key, LatencyHistogram())
+        return histogram
+
+    def request_finished(self, dic):
+        elapsed = dic['elapsed']
+        self._histogram(self._methods, dic['method']).record(elapsed)
+        self._histogram(self._servers, dic['server']).record(elapsed)
+        if dic.get('error') is not None:
+            with self._lock:
+                self._errors[dic['method']] = self._errors.get(dic['method'], 0) + 1
+
+    def method_histogram(self, method):
+        """ Returns the :class:`LatencyHistogram` for a Thrift method. """
+        return self._histogram(self._methods, method)
+
+    def server_histogram(self, server):
+        """ Returns the :class:`LatencyHistogram` for a server. """
+        return self._histogram(self._servers, server)
+
+    def snapshot(self, reset=False):
+        """
+        Returns a dictionary of the form::
+
+            {'methods': {method: summary},
+             'servers': {server: summary},
+             'errors': {method: failed_attempts}}
+
+        where each summary is the result of :meth:`LatencyHistogram.summary()`.
+        If `reset` is ``True``, the histograms are emptied as they are read.
+        """
+        with self._lock:
+            methods = self._methods.items()
+            servers = self._servers.items()
+            errors = dict(self._errors)
+            if reset:
+                self._errors = {}
+        ret = {'methods': {}, 'servers': {}, 'errors': errors}
+        for group, items in (('methods', methods), ('servers', servers)):
+            for key, histogram in items:
+                ret[group][key] = histogram.copy(reset).summary()
+        return ret
+
+    def reset(self):
+        """ Empties every histogram. """
+        with self._lock:
+            self._methods = {}
+            self._servers = {}
+            self._errors = {}
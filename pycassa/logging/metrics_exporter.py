@@ -0,0 +1,298 @@
+"""
+Exports connection pool and request metrics in the Prometheus text
+format or to a StatsD server.
+"""
+
+import BaseHTTPServer
+import socket
+import threading
+
+from pycassa.logging.latency_stats_logger import LatencyStatsLogger
+from pycassa.logging.pool_stats_logger import StatsLogger
+from pycassa.logging.traffic_stats_logger import TrafficStatsLogger
+
+__all__ = ['MetricsExporter', 'StatsdEmitter']
+
+_QUANTILES = (('0.5', 'p50'), ('0.9', 'p90'), ('0.99', 'p99'), ('0.999', 'p999'))
+
+
+def _find_listener(pool, cls):
+    for listener in pool.listeners:
+        if isinstance(listener, cls):
+            return listener
+    return None
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+class MetricsExporter(object):
+    """
+    Collects metrics from one or more :class:`~pycassa.pool.ConnectionPool`
+    objects.
+
+    The number of idle, checked out and overflow connections, the number
+    of blocked checkouts, and the time checkouts spent blocked are always
+    reported.  Connection, retry and failure counts are reported for pools
+    that have a :class:`~pycassa.logging.pool_stats_logger.StatsLogger`
+    listener, request latencies and errors for pools that have a
+    :class:`~pycassa.logging.latency_stats_logger.LatencyStatsLogger`
+    listener, and bytes sent and received for pools that have a
+    :class:`~pycassa.logging.traffic_stats_logger.TrafficStatsLogger`
+    listener.  Each sample is labelled with the pool's `logging_name`.
+
+    Usage::
+
+        >>> pool = ConnectionPool(..., listeners=[StatsLogger(), LatencyStatsLogger()])
+        >>> exporter = MetricsExporter(pool)
+        >>>
+        >>> # serve http://127.0.0.1:9101/metrics to Prometheus
+        >>> server = exporter.serve_prometheus(9101)
+        >>>
+        >>> # or push to a StatsD daemon every ten seconds
+        >>> emitter = StatsdEmitter(exporter, 'localhost', 8125)
+        >>> emitter.start(10)
+
+    """
+
+    def __init__(self, pools, prefix='pycassa'):
+        """
+        `pools` may be a single pool or a list of pools.  Every metric
+        name begins with `prefix`.
+        """
+        if not isinstance(pools, (list, tuple)):
+            pools = [pools]
+        self.pools = list(pools)
+        self.prefix = prefix
+
+    def add_pool(self, pool):
+        """ Starts reporting metrics for another pool. """
+        self.pools.append(pool)
+
+    def collect(self):
+        """
+        Returns a list of ``(name, type, help, samples)`` tuples, one for
+        each metric, where `type` is ``'gauge'``, ``'counter'`` or
+        ``'summary'`` and `samples` is a list of ``(suffix, labels, value)``
+        tuples.  `suffix` is appended to the metric name and `labels` is
+        a dictionary.
+        """
+        metrics = []
+        index = {}
+
+        def add(name, kind, help, labels, value, suffix=''):
+            name = '%s_%s' % (self.prefix, name)
+            if name not in index:
+                index[name] = (name, kind, help, [])
+                metrics.append(index[name])
+            index[name][3].append((suffix, labels, value))
+
+        for pool in self.pools:
+            pool_label = {'pool': pool.logging_name}
+            add('pool_size', 'gauge', 'Configured number of connections.',
+                pool_label, pool.size())
+            add('pool_checked_in', 'gauge', 'Idle connections in the pool.',
+                pool_label, pool.checkedin())
+            add('pool_checked_out', 'gauge', 'Connections checked out of the pool.',
+                pool_label, pool.checkedout())
+            add('pool_overflow', 'gauge', 'Open overflow connections.',
+                pool_label, pool.overflow())
+            add('pool_waiters', 'gauge', 'Checkouts blocked on an exhausted pool.',
+                pool_label, pool.waiters())
+            self._add_summary(add, 'pool_wait_seconds',
+                              'Time checkouts spent blocked on an exhausted pool.',
+                              pool_label, pool.wait_stats())
+
+            stats_logger = _find_listener(pool, StatsLogger)
+            if stats_logger is not None:
+                stats = stats_logger.stats
+                for result in ('success', 'failure'):
+                    labels = dict(pool_label, result=result)
+                    add('connections_created_total', 'counter',
+                        'Attempts to open a connection.',
+                        labels, stats['created'][result])
+                    add('connections_disposed_total', 'counter',
+                        'Connections closed by the pool.',
+                        labels, stats['disposed'][result])
+                add('connections_recycled_total', 'counter',
+                    'Connections replaced after reaching max_lifetime.',
+                    pool_label, stats['recycled'])
+                add('connection_failures_total', 'counter',
+                    'Failed operations on a connection.',
+                    pool_label, stats['failed'])
+                for outcome in ('allowed', 'denied'):
+                    add('retries_total', 'counter',
+                        'Retries, by whether the retry budget allowed them.',
+                        dict(pool_label, outcome=outcome), stats['retried'][outcome])
+                add('pool_at_max_total', 'counter',
+                    'Checkouts that found the pool exhausted.',
+                    pool_label, stats['at_max'])
+                add('pool_wait_exceeded_total', 'counter',
+                    'Checkouts that waited longer than wait_threshold.',
+                    pool_label, stats['wait_exceeded'])
+                add('pool_resized_total', 'counter',
+                    'Changes to the size of the pool.',
+                    pool_label, stats['resized'])
+
+            latency_logger = _find_listener(pool, LatencyStatsLogger)
+            if latency_logger is not None:
+                snapshot = latency_logger.snapshot()
+                for group, label in (('methods', 'method'), ('servers', 'server')):
+                    name = 'request_latency_seconds' if group == 'methods' \
+                            else 'server_latency_seconds'
+                    help = 'Latency of Thrift calls by %s.' % label
+                    for key, summary in sorted(snapshot[group].items()):
+                        labels = dict(pool_label)
+                        labels[label] = key
+                        self._add_summary(add, name, help, labels, summary)
+                for method, errors in sorted(snapshot['errors'].items()):
+                    add('request_errors_total', 'counter',
+                        'Thrift calls that raised an exception.',
+                        dict(pool_label, method=method), errors)
+
+            traffic_logger = _find_listener(pool, TrafficStatsLogger)
+            if traffic_logger is not None:
+                for cf, methods in sorted(traffic_logger.stats.items()):
+                    for method, counts in sorted(methods.items()):
+                        labels = dict(pool_label, column_family=cf or '', method=method)
+                        add('bytes_sent_total', 'counter',
+                            'Bytes written to servers, including framing.',
+                            labels, counts['sent'])
+                        add('bytes_received_total', 'counter',
+                            'Bytes read from servers, including framing.',
+                            labels, counts['received'])
+
+        return metrics
+
+    def _add_summary(self, add, name, help, labels, summary):
+        if summary['count']:
+            for quantile, field in _QUANTILES:
+                add(name, 'summary', help, dict(labels, quantile=quantile), summary[field])
+            total = summary['mean'] * summary['count']
+        else:
+            total = 0.0
+        add(name, 'summary', help, labels, total, '_sum')
+        add(name, 'summary', help, labels, summary['count'], '_count')
+
+    def prometheus_text(self):
+        """ Returns every metric in the Prometheus text exposition format. """
+        lines = []
+        for name, kind, help, samples in self.collect():
+            lines.append('# HELP %s %s' % (name, help))
+            lines.append('# TYPE %s %s' % (name, kind))
+            for suffix, labels, value in samples:
+                label_str = ','.join('%s="%s"' % (k, _escape(v))
+                                     for k, v in sorted(labels.items()))
+                lines.append('%s%s{%s} %s' % (name, suffix, label_str, _format_value(value)))
+        return '\n'.join(lines) + '\n'
+
+    def serve_prometheus(self, port, address='127.0.0.1'):
+        """
+        Starts serving :meth:`prometheus_text()` over HTTP on `address`
+        and `port` from a daemon thread.  The server is returned; call its
+        ``shutdown()`` method to stop it.
+        """
+        exporter = self
+
+        class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                body = exporter.prometheus_text()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = BaseHTTPServer.HTTPServer((address, port), Handler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.setDaemon(True)
+        thread.start()
+        return server
+
+
+class StatsdEmitter(object):
+    """
+    Sends the metrics of a :class:`MetricsExporter` to a StatsD server
+    over UDP.  Gauges and latency percentiles are sent as gauges, and
+    counters are sent as the change since the previous call to
+    :meth:`emit()`.
+    """
+
+    def __init__(self, exporter, host='127.0.0.1', port=8125):
+        self.exporter = exporter
+        self.address = (host, port)
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._last_counts = {}
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def _stat_name(self, name, suffix, labels):
+        parts = [name + suffix]
+        for key, value in sorted(labels.items()):
+            parts.append('%s_%s' % (key, str(value).replace('.', '_').replace(':', '_')))
+        return '.'.join(parts)
+
+    def lines(self):
+        """ Returns the StatsD lines that :meth:`emit()` would send. """
+        lines = []
+        for name, kind, help, samples in self.exporter.collect():
+            for suffix, labels, value in samples:
+                stat = self._stat_name(name, suffix, labels)
+                if kind == 'counter' or suffix == '_count':
+                    delta = value - self._last_counts.get(stat, 0)
+                    self._last_counts[stat] = value
+                    if delta:
+                        lines.append('%s:%d|c' % (stat, delta))
+                elif suffix != '_sum':
+                    lines.append('%s:%s|g' % (stat, _format_value(value)))
+        return lines
+
+    def emit(self):
+        """ Sends every metric to the StatsD server. """
+        packet = []
+        size = 0
+        # Keep each datagram under a typical network MTU
+        for line in self.lines():
+            if packet and size + len(line) + 1 > 1400:
+                self._socket.sendto('\n'.join(packet), self.address)
+                packet, size = [], 0
+            packet.append(line)
+            size += len(line) + 1
+        if packet:
+            self._socket.sendto('\n'.join(packet), self.address)
+
+    def start(self, interval=10.0):
+        """ Calls :meth:`emit()` every `interval` seconds from a daemon thread. """
+        def run():
+            while True:
+                # Event.wait() only returns the flag from Python 2.7
+                self._stopped.wait(interval)
+                if self._stopped.isSet():
+                    return
+                try:
+                    self.emit()
+                except socket.error:
+                    pass
+
+        self._stopped.clear()
+        self._thread = threading.Thread(target=run)
+        self._thread.setDaemon(True)
+        self._thread.start()
+
+    def stop(self):
+        """ Stops the thread started by :meth:`start()`. """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -3,6 +3,20 @@ import logging
 
 class PoolLogger(object):
 
+    # The most severe level each event is logged at
+    _EVENT_LEVELS = {'connection_created': logging.WARN,
+                     'connection_checked_out': logging.DEBUG,
+                     'connection_checked_in': logging.DEBUG,
+                     'connection_disposed': logging.DEBUG,
+                     'connection_recycled': logging.DEBUG,
+                     'connection_failed': logging.INFO,
+                     'connection_retried': logging.WARN,
+                     'obtained_server_list': logging.DEBUG,
+                     'pool_disposed': logging.INFO,
+                     'pool_at_max': logging.INFO,
+                     'pool_wait_exceeded': logging.WARN,
+                     'pool_resized': logging.INFO}
+
     def __init__(self):
         self.root_logger = pycassa_logger.PycassaLogger()
         self.logger = self.root_logger.add_child_logger('pool', self.name_changed)
@@ -10,6 +24,11 @@ class PoolLogger(object):
     def name_changed(self, new_logger):
         self.logger = new_logger
 
+    def enabled_events(self):
+        """ Returns the events that would be logged at the current level. """
+        return [event for event, level in self._EVENT_LEVELS.iteritems()
+                if self.logger.isEnabledFor(level)]
+
     def connection_created(self, dic):
         level = pycassa_logger.levels[dic.get('level', 'info')]
         conn = dic.get('connection')
@@ -70,6 +89,21 @@ class PoolLogger(object):
                 id(conn), dic.get('server'),
                 dic.get('pool_id'), str(dic.get('error')))
 
+    def connection_retried(self, dic):
+        level = pycassa_logger.levels[dic.get('level', 'info')]
+        conn = dic.get('connection')
+        if dic.get('allowed'):
+            self.logger.log(level,
+                    "Connection %s (%s) in pool %s will retry in %.3fs after: %s",
+                    id(conn), dic.get('server'), dic.get('pool_id'),
+                    dic.get('delay'), str(dic.get('error')))
+        else:
+            self.logger.log(level,
+                    "Connection %s (%s) in pool %s will not retry, the retry "
+                    "budget is exhausted: %s",
+                    id(conn), dic.get('server'), dic.get('pool_id'),
+                    str(dic.get('error')))
+
     def obtained_server_list(self, dic):
         level = pycassa_logger.levels[dic.get('level', 'info')]
         self.logger.log(level,
@@ -87,3 +121,18 @@ class PoolLogger(object):
                 "Pool %s had a checkout request but was already "
                 "at its max size (%s)",
                 dic.get('pool_id'), dic.get('pool_max'))
+
+    def pool_wait_exceeded(self, dic):
+        level = pycassa_logger.levels[dic.get('level', 'warn')]
+        self.logger.log(level,
+                "A checkout from pool %s has waited %.3f seconds for a "
+                "connection (max size %s, %s waiting)",
+                dic.get('pool_id'), dic.get('wait'), dic.get('pool_max'),
+                dic.get('waiters'))
+
+    def pool_resized(self, dic):
+        level = pycassa_logger.levels[dic.get('level', 'info')]
+        self.logger.log(level,
+                "Pool %s was resized from %s to %s connections: %s",
+                dic.get('pool_id'), dic.get('old_size'), dic.get('new_size'),
+                dic.get('reason'))
@@ -2,6 +2,12 @@ import pycassa_logger
 import logging
 import threading
 import functools
+import itertools
+
+_COUNTERS = ('created_success', 'created_failure', 'checked_out', 'checked_in',
+             'disposed_success', 'disposed_failure', 'recycled',
+             'retried_allowed', 'retried_denied', 'failed', 'list', 'at_max',
+             'wait_exceeded', 'resized')
 
 def sync(lock_name):
     def wrapper(f):
@@ -42,97 +48,175 @@ class StatsLogger(object):
          'failed': 1,
          'list': 0,
          'opened': {'current': 2, 'max': 2},
-         'recycled': 0}
+         'recycled': 0,
+         'retried': {'allowed': 0, 'denied': 0},
+         'wait_exceeded': 0,
+         'resized': 0}
 
 
     Get your stats as ``stats_logger.stats`` and push them to your metrics
     system.
+
+    Each thread counts events on its own, without taking a lock, and the
+    counts are only added up when ``stats`` is read.  ``opened['current']``
+    is exact, but ``opened['max']`` is approximate: it is tracked without
+    a lock, and may be off by up to the number of threads that were
+    checking connections in and out at the same moment.
     """
 
     def __init__(self):
-        #some callbacks are already locked by pool_lock, it's just simpler to have a global here for all operations
+        # Held only to register a thread's counters, to reset, and to read
+        # the stats; events never take it
         self.lock = threading.Lock()
+        self._local = threading.local()
+        self._shards = []
+        self._retired = dict.fromkeys(_COUNTERS, 0)
+
+        # Checkout and checkin ordinals, used to track the high-water mark
+        # of opened connections without a lock
+        self._checkouts = itertools.count(1)
+        self._checkins = itertools.count(1)
+        self._last_checkin = 0
+        self._max_opened = 0
+        self._opened_base = 0
+        self._baseline = dict.fromkeys(_COUNTERS, 0)
         self.reset()
 
+    def _shard(self):
+        try:
+            return self._local.counts
+        except AttributeError:
+            counts = dict.fromkeys(_COUNTERS, 0)
+            with self.lock:
+                self._shards.append((threading.current_thread(), counts))
+            self._local.counts = counts
+            return counts
+
+    def _totals(self):
+        # Must be called with the lock held.  Only the owning thread writes
+        # to a shard, so the shards of finished threads can be folded away.
+        totals = dict(self._retired)
+        live = []
+        for thread, counts in self._shards:
+            if thread.is_alive():
+                live.append((thread, counts))
+                for key in _COUNTERS:
+                    totals[key] += counts[key]
+            else:
+                for key in _COUNTERS:
+                    self._retired[key] += counts[key]
+                    totals[key] += counts[key]
+        self._shards = live
+        return totals
+
     @sync('lock')
     def reset(self):
         """ Reset all counters to 0 """
-        self._stats = {
+        self._baseline = self._totals()
+        self._opened_base = self._baseline['checked_out'] - self._baseline['checked_in']
+        self._max_opened = 0
+        self._stats = self._build_stats(dict.fromkeys(_COUNTERS, 0))
+
+    def _build_stats(self, counts):
+        opened = counts['checked_out'] - counts['checked_in']
+        return {
             'created': {
-                'success': 0,
-                'failure': 0,
+                'success': counts['created_success'],
+                'failure': counts['created_failure'],
                 },
-            'checked_out': 0,
-            'checked_in': 0,
+            'checked_out': counts['checked_out'],
+            'checked_in': counts['checked_in'],
             'opened': {
-                'current': 0,
-                'max': 0
+                'current': opened,
+                'max': max(self._max_opened, opened)
             },
             'disposed': {
-                'success': 0,
-                'failure': 0
+                'success': counts['disposed_success'],
+                'failure': counts['disposed_failure']
             },
-            'recycled': 0,
-            'failed': 0,
-            'list': 0,
-            'at_max': 0
+            'recycled': counts['recycled'],
+            'retried': {
+                'allowed': counts['retried_allowed'],
+                'denied': counts['retried_denied']
+            },
+            'failed': counts['failed'],
+            'list': counts['list'],
+            'at_max': counts['at_max'],
+            'wait_exceeded': counts['wait_exceeded'],
+            'resized': counts['resized']
         }
 
-
     def name_changed(self, new_logger):
         self.logger = new_logger
 
-    @sync('lock')
     def connection_created(self, dic):
         level = pycassa_logger.levels[dic.get('level', 'info')]
         if level <= logging.INFO:
-            self._stats['created']['success'] += 1
+            self._shard()['created_success'] += 1
         else:
-            self._stats['created']['failure'] += 1
+            self._shard()['created_failure'] += 1
 
-    @sync('lock')
     def connection_checked_out(self, dic):
-        self._stats['checked_out'] += 1
-        self._update_opened(1)
+        self._shard()['checked_out'] += 1
+        # These check-then-set updates race with other threads on purpose:
+        # a concurrent checkout may overwrite a slightly higher maximum, and
+        # a checkin that is not yet recorded makes this estimate slightly
+        # high.  Either error is bounded by the number of racing threads.
+        opened = self._checkouts.next() - self._last_checkin - self._opened_base
+        if opened > self._max_opened:
+            self._max_opened = opened
 
-    @sync('lock')
     def connection_checked_in(self, dic):
-        self._stats['checked_in'] += 1
-        self._update_opened(-1)
+        self._shard()['checked_in'] += 1
+        # May be overwritten by a racing thread with a slightly lower
+        # ordinal; the next checkin corrects it
+        checkin = self._checkins.next()
+        if checkin > self._last_checkin:
+            self._last_checkin = checkin
 
-    def _update_opened(self, value):
-        self._stats['opened']['current'] += value
-        if self._stats['opened']['current'] > self._stats['opened']['max']:
-            self._stats['opened']['max'] = self._stats['opened']['current']
-
-    @sync('lock')
     def connection_disposed(self, dic):
         level = pycassa_logger.levels[dic.get('level', 'info')]
         if level <= logging.INFO:
-            self._stats['disposed']['success'] += 1
+            self._shard()['disposed_success'] += 1
         else:
-            self._stats['disposed']['failure'] += 1
+            self._shard()['disposed_failure'] += 1
 
-    @sync('lock')
     def connection_recycled(self, dic):
-        self._stats['recycled'] += 1
+        self._shard()['recycled'] += 1
 
-    @sync('lock')
     def connection_failed(self, dic):
-        self._stats['failed'] += 1
+        self._shard()['failed'] += 1
+
+    def connection_retried(self, dic):
+        if dic.get('allowed'):
+            self._shard()['retried_allowed'] += 1
+        else:
+            self._shard()['retried_denied'] += 1
 
-    @sync('lock')
     def obtained_server_list(self, dic):
-        self._stats['list'] += 1
+        self._shard()['list'] += 1
 
-    @sync('lock')
     def pool_disposed(self, dic):
         pass
 
-    @sync('lock')
     def pool_at_max(self, dic):
-        self._stats['at_max'] += 1
+        self._shard()['at_max'] += 1
+
+    def pool_wait_exceeded(self, dic):
+        self._shard()['wait_exceeded'] += 1
+
+    def pool_resized(self, dic):
+        self._shard()['resized'] += 1
 
     @property
     def stats(self):
-        return self._stats
+        """
+        The counts since the last :meth:`reset()`, in the form shown
+        above.  ``opened['max']`` is approximate when connections are
+        checked in and out from many threads at once.
+        """
+        with self.lock:
+            totals = self._totals()
+            counts = dict((key, totals[key] - self._baseline[key]) for key in _COUNTERS)
+            self._stats = self._build_stats(counts)
+            return self._stats
@@ -59,6 +59,7 @@ class PycassaLogger:
             self._logger_name = None
             self._level = None
             self._child_loggers = []
+            self._level_change_callbacks = []
             self.set_logger_name(_DEFAULT_LOGGER_NAME)
             self.set_logger_level(_DEFAULT_LEVEL)
 
@@ -70,6 +71,8 @@ class PycassaLogger:
         """ Sets the logging level for all pycassa logging. """
         self._level = level
         self._root_logger.setLevel(levels[level])
+        for callback in self._level_change_callbacks:
+            callback()
 
     def get_logger_level(self):
         """ Gets the logging level for all pycassa logging. """
@@ -101,6 +104,14 @@ class PycassaLogger:
         self._child_loggers.append((new_logger, child_logger_name, name_change_callback))
         return new_logger
 
+    def add_level_change_callback(self, callback):
+        """
+        Adds a function that is called with no arguments whenever
+        :meth:`set_logger_level()` changes the level.
+
+        """
+        self._level_change_callbacks.append(callback)
+
 class NullHandler(logging.Handler):
     """ For python pre 2.7 compatibility. """
     def emit(self, record):
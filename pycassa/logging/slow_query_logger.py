@@ -0,0 +1,137 @@
+""" Logging of slow Thrift calls, with optional server side tracing. """
+
+import collections
+import itertools
+import uuid
+
+import pycassa_logger
+
+__all__ = ['SlowQueryLogger', 'describe_request']
+
+
+def _slice_summary(predicate):
+    if predicate is None:
+        return None
+    if predicate.column_names is not None:
+        return '%d columns by name' % len(predicate.column_names)
+    slice_range = predicate.slice_range
+    if slice_range is None:
+        return None
+    return 'slice %r..%r, count %d%s' % (slice_range.start, slice_range.finish,
+                                         slice_range.count,
+                                         ', reversed' if slice_range.reversed else '')
+
+
+def describe_request(method, args):
+    """
+    Describes a call to the Thrift method named `method` with the
+    positional arguments `args`, as recorded in a connection's
+    ``info['request']``.
+
+    A dictionary is returned with the ``column_families`` the call
+    touches, the number of ``keys`` it reads or writes (``None`` when a
+    range scan has no fixed number), and a ``predicate`` summary (or
+    ``None``).
+    """
+    cfs, keys, predicate = [], None, None
+    try:
+        if method in ('get', 'get_slice', 'get_count', 'insert', 'add',
+                      'remove', 'remove_counter'):
+            cfs = [args[1].column_family]
+            keys = 1
+            if method in ('get_slice', 'get_count'):
+                predicate = _slice_summary(args[2])
+        elif method in ('multiget_slice', 'multiget_count'):
+            cfs = [args[1].column_family]
+            keys = len(args[0])
+            predicate = _slice_summary(args[2])
+        elif method == 'get_range_slices':
+            cfs = [args[0].column_family]
+            keys = args[2].count
+            predicate = _slice_summary(args[1])
+        elif method == 'get_indexed_slices':
+            cfs = [args[0].column_family]
+            keys = args[1].count
+            predicate = _slice_summary(args[2])
+        elif method == 'batch_mutate':
+            keys = len(args[0])
+            cf_set = set()
+            for key_mutations in args[0].itervalues():
+                cf_set.update(key_mutations)
+            cfs = sorted(cf_set)
+        elif method == 'truncate':
+            cfs = [args[0]]
+    except (IndexError, AttributeError, TypeError):
+        pass
+    return {'column_families': cfs, 'keys': keys, 'predicate': predicate}
+
+
+class SlowQueryLogger(object):
+    """
+    A pool listener that logs every attempt at a Thrift call that takes
+    at least `threshold` seconds, along with the column family, method,
+    number of keys, slice predicate, server and retry count.  Records are
+    logged at the ``WARN`` level to the ``slow_query`` child of the
+    pycassa logger.
+
+    If `trace_every` is greater than 0, one in every `trace_every` slow
+    calls enables server side tracing for the next call on the same
+    connection with ``trace_next_query()``.  The trace session ids are
+    logged and the most recent are kept in `traces`, a list of
+    ``(server, session_id)`` tuples; read them back from the
+    ``system_traces`` keyspace.  Tracing requires Cassandra 1.2 or later.
+
+    Usage::
+
+        >>> slow_queries = SlowQueryLogger(threshold=0.5, trace_every=10)
+        >>> pool = ConnectionPool(..., listeners=[slow_queries])
+
+    """
+
+    def __init__(self, threshold=1.0, trace_every=0, max_traces=100):
+        self.threshold = threshold
+        self.trace_every = trace_every
+        self._traces = collections.deque(maxlen=max_traces)
+        self._slow_count = itertools.count(1)
+        self.root_logger = pycassa_logger.PycassaLogger()
+        self.logger = self.root_logger.add_child_logger('slow_query', self.name_changed)
+
+    def name_changed(self, new_logger):
+        self.logger = new_logger
+
+    @property
+    def traces(self):
+        return list(self._traces)
+
+    def request_finished(self, dic):
+        elapsed = dic['elapsed']
+        if elapsed < self.threshold:
+            return
+
+        conn = dic.get('connection')
+        method = dic['method']
+        request = getattr(conn, 'info', {}).get('request') or {}
+        details = describe_request(method, request.get('args', ()))
+        error = dic.get('error')
+        self.logger.warn(
+                "Slow %s on %s took %.3fs on %s (pool %s): %s keys, predicate %s, "
+                "%d retries%s",
+                method, ','.join(details['column_families']) or '-', elapsed,
+                dic.get('server'), dic.get('pool_id'), details['keys'],
+                details['predicate'], getattr(conn, '_retry_count', 0),
+                '' if error is None else ', failed with %s: %s' % (error.__class__.__name__, error))
+
+        # The caller still has the connection checked out, so it is safe to
+        # use here; skip connections that just failed
+        if (self.trace_every > 0 and error is None and conn is not None and
+                self._slow_count.next() % self.trace_every == 0):
+            self._trace(conn, dic.get('server'))
+
+    def _trace(self, conn, server):
+        try:
+            session_id = uuid.UUID(bytes=conn.trace_next_query())
+        except Exception, exc:
+            self.logger.debug("Could not enable tracing on %s: %s", server, exc)
+            return
+        self._traces.append((server, session_id))
+        self.logger.warn("Tracing the next query on %s as session %s", server, session_id)
@@ -0,0 +1,95 @@
+""" Network traffic per column family and Thrift method. """
+
+import threading
+
+from pycassa.logging.slow_query_logger import describe_request
+
+__all__ = ['TrafficStatsLogger']
+
+
+class TrafficStatsLogger(object):
+    """
+    A pool listener that adds up the bytes sent to and received from the
+    servers, grouped by column family and Thrift method, so that the
+    reads and writes using the most bandwidth can be found.
+
+    Byte counts include Thrift framing.  A ``batch_mutate`` that touches
+    several column families is split between them in proportion to the
+    number of mutations for each one.  Calls that don't belong to a
+    column family, such as ``describe_keyspace``, are grouped under
+    ``None``.
+
+    Usage::
+
+        >>> traffic = TrafficStatsLogger()
+        >>> pool = ConnectionPool(..., listeners=[traffic])
+        >>>
+        >>> # use the pool for a while...
+        >>> traffic.top(1)
+        [('Users', 'multiget_slice', {'calls': 120, 'sent': 30240, 'received': 9541830})]
+
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _add(self, cf, method, sent, received):
+        key = (cf, method)
+        with self._lock:
+            counts = self._stats.get(key)
+            if counts is None:
+                counts = self._stats[key] = {'calls': 0, 'sent': 0, 'received': 0}
+            counts['calls'] += 1
+            counts['sent'] += sent
+            counts['received'] += received
+
+    def request_finished(self, dic):
+        method = dic['method']
+        sent = dic.get('bytes_sent', 0)
+        received = dic.get('bytes_received', 0)
+        request = getattr(dic.get('connection'), 'info', {}).get('request') or {}
+        args = request.get('args', ())
+
+        if method == 'batch_mutate' and args:
+            weights = {}
+            for key_mutations in args[0].itervalues():
+                for cf, mutations in key_mutations.iteritems():
+                    weights[cf] = weights.get(cf, 0) + len(mutations)
+            total = sum(weights.itervalues())
+            if total:
+                for cf, weight in weights.iteritems():
+                    share = float(weight) / total
+                    self._add(cf, method, int(sent * share), int(received * share))
+                return
+
+        cfs = describe_request(method, args)['column_families']
+        self._add(cfs[0] if cfs else None, method, sent, received)
+
+    @property
+    def stats(self):
+        """
+        A dictionary of the form
+        ``{column_family: {method: {'calls': n, 'sent': bytes, 'received': bytes}}}``.
+        """
+        ret = {}
+        with self._lock:
+            for (cf, method), counts in self._stats.iteritems():
+                ret.setdefault(cf, {})[method] = dict(counts)
+        return ret
+
+    def top(self, n=10, by='received'):
+        """
+        Returns the `n` ``(column_family, method, counts)`` tuples with the
+        most bytes, where `by` is ``'received'`` or ``'sent'``.
+        """
+        with self._lock:
+            items = [(cf, method, dict(counts))
+                     for (cf, method), counts in self._stats.iteritems()]
+        items.sort(key=lambda item: item[2][by], reverse=True)
+        return items[:n]
+
+    def reset(self):
+        """ Reset all counters to 0 """
+        with self._lock:
+            self._stats = {}
@@ -30,7 +30,45 @@ _BASIC_TYPES = ('BytesType', 'LongType', 'IntegerType', 'UTF8Type',
                 'DateType', 'BooleanType', 'UUIDType', 'Int32Type',
                 'DecimalType')
 
+# Packers, unpackers and type names are built once per type string
+# and shared by every ColumnFamily in the process.  They hold no state,
+# so sharing them between threads is safe.  DynamicCompositeType values
+# carry their own type strings, so each cache is emptied once it holds
+# _MAX_CACHED_TYPES entries rather than being allowed to grow forever.
+_MAX_CACHED_TYPES = 1000
+_type_name_cache = {}
+_packer_cache = {}
+_unpacker_cache = {}
+
+def _cached(cache, build, typestr):
+    try:
+        return cache[typestr]
+    except KeyError:
+        pass
+
+    if typestr is None:
+        normalized = None
+    elif isinstance(typestr, basestring):
+        # 'CompositeType(LongType, AsciiType)' and
+        # 'CompositeType(LongType,AsciiType)' are the same type
+        normalized = ''.join(typestr.split())
+    else:
+        return build(typestr)
+
+    try:
+        value = cache[normalized]
+    except KeyError:
+        value = build(typestr)
+        if len(cache) >= _MAX_CACHED_TYPES:
+            cache.clear()
+        cache[normalized] = value
+    cache[typestr] = value
+    return value
+
 def extract_type_name(typestr):
+    return _cached(_type_name_cache, _extract_type_name, typestr)
+
+def _extract_type_name(typestr):
     if typestr is None:
         return 'BytesType'
 
@@ -79,19 +117,113 @@ def _to_timestamp(v):
         converted = v * 1e3
     return long(converted)
 
+# Struct formats for the composite components that have a fixed width
+_FIXED_WIDTH_FORMATS = {'LongType': 'q',
+                        'Int32Type': 'i',
+                        'DoubleType': 'd',
+                        'FloatType': 'f',
+                        'DateType': 'q',
+                        'BooleanType': 'B',
+                        'UUIDType': '16s',
+                        'TimeUUIDType': '16s',
+                        'LexicalUUIDType': '16s'}
+
+def _composite_components(typestr, composite_type):
+    """
+    Returns a list of ``(data_type, packer, unpacker)`` for each component
+    of a composite. `data_type` is ``None`` for custom component types.
+    """
+    components = []
+    if typestr:
+        for inner_type in _get_inner_types(typestr):
+            if "ReversedType" in inner_type:
+                data_type = extract_type_name(_get_inner_type(inner_type))
+            else:
+                data_type = extract_type_name(inner_type)
+            components.append((data_type, packer_for(inner_type),
+                               unpacker_for(inner_type)))
+    else:
+        for c in composite_type.components:
+            cls = c.__class__
+            # Subclasses and types defined elsewhere may override pack
+            # and unpack, so only trust the classes in pycassa.types
+            if cls.__module__ == 'pycassa.types':
+                data_type = cls.__name__
+            else:
+                data_type = None
+            components.append((data_type, c.pack, c.unpack))
+    return components
+
+class _NotFixedWidth(Exception):
+    """ A value packed to a different width than its struct format. """
+    pass
+
+def _fixed_width_codec(data_type, packer):
+    """
+    For fixed width types, returns ``(struct_format, to_struct, from_struct)``
+    where the two converters may be ``None``. Returns ``None`` otherwise.
+    """
+    fmt = _FIXED_WIDTH_FORMATS.get(data_type)
+    if fmt is None:
+        return None
+    elif data_type == 'DateType':
+        return (fmt, _to_timestamp,
+                lambda v: datetime.utcfromtimestamp(v / 1e3))
+    elif data_type == 'BooleanType':
+        return (fmt, bool, bool)
+    elif fmt == '16s':
+        def to_struct(value):
+            # struct would silently pad or truncate anything that is not
+            # exactly 16 bytes, so leave those values to the generic path
+            packed = packer(value)
+            if len(packed) != 16:
+                raise _NotFixedWidth()
+            return packed
+        return (fmt, to_struct, lambda v: uuid.UUID(bytes=v))
+    else:
+        return (fmt, None, None)
+
 def get_composite_packer(typestr=None, composite_type=None):
     assert (typestr or composite_type), "Must provide typestr or " + \
             "CompositeType instance"
-    if typestr:
-        packers = map(packer_for, _get_inner_types(typestr))
-    elif composite_type:
-        packers = [c.pack for c in composite_type.components]
+    components = _composite_components(typestr, composite_type)
+    packers = [packer for _, packer, _ in components]
+    codecs = [_fixed_width_codec(data_type, packer)
+              for data_type, packer, _ in components]
+
+    # When every component has a fixed width, a full composite can
+    # be packed with a single Struct
+    all_fixed = None not in codecs
+    if all_fixed:
+        whole_packer = make_packer('>' + ''.join(['H%sc' % c[0] for c in codecs]))
+        widths = [struct.calcsize('>' + c[0]) for c in codecs]
+        converters = [c[1] for c in codecs]
+        num_components = len(codecs)
 
     len_packer = _short_packer.pack
 
     def pack_composite(items, slice_start=None):
         last_index = len(items) - 1
-        s = ''
+
+        if all_fixed and last_index == num_components - 1:
+            values = []
+            try:
+                for item, width, convert in zip(items, widths, converters):
+                    if isinstance(item, tuple):
+                        break
+                    if convert is not None:
+                        item = convert(item)
+                    values.extend((width, item, '\x00'))
+                else:
+                    if slice_start:
+                        values[-1] = '\xff'
+                    elif slice_start is False:
+                        values[-1] = '\x01'
+                    return whole_packer.pack(*values)
+            except _NotFixedWidth:
+                pass
+
+        parts = []
         for i, (item, packer) in enumerate(zip(items, packers)):
             eoc = '\x00'
             if isinstance(item, tuple):
@@ -113,47 +245,90 @@ def get_composite_packer(typestr=None, composite_type=None):
                     eoc = '\x01'
 
             packed = packer(item)
-            s += ''.join((len_packer(len(packed)), packed, eoc))
-        return s
+            parts.extend((len_packer(len(packed)), packed, eoc))
+        return ''.join(parts)
 
     return pack_composite
 
 def get_composite_unpacker(typestr=None, composite_type=None):
     assert (typestr or composite_type), "Must provide typestr or " + \
             "CompositeType instance"
-    if typestr:
-        unpackers = map(unpacker_for, _get_inner_types(typestr))
-    elif composite_type:
-        unpackers = [c.unpack for c in composite_type.components]
+    components = _composite_components(typestr, composite_type)
+    unpackers = [unpacker for _, _, unpacker in components]
+    codecs = [_fixed_width_codec(data_type, packer)
+              for data_type, packer, _ in components]
+
+    # Fixed width components are read in place with unpack_from()
+    # instead of slicing out a copy of their bytes first
+    fixed_unpackers = []
+    for codec in codecs:
+        if codec is None:
+            fixed_unpackers.append(None)
+        else:
+            fixed = make_packer('>' + codec[0])
+            fixed_unpackers.append((fixed.size, fixed.unpack_from, codec[2]))
+
+    all_fixed = None not in codecs
+    if all_fixed:
+        whole_packer = make_packer('>' + ''.join(['H%sc' % c[0] for c in codecs]))
+        widths = tuple([f[0] for f in fixed_unpackers])
+        converters = [c[2] for c in codecs]
 
-    len_unpacker = lambda v: _short_packer.unpack(v)[0]
+    len_unpack_from = _short_packer.unpack_from
 
     def unpack_composite(bytestr):
         # The composite format for each component is:
         #   <len>   <value>   <eoc>
         # 2 bytes | ? bytes | 1 byte
+        if all_fixed and len(bytestr) == whole_packer.size:
+            values = whole_packer.unpack(bytestr)
+            if values[0::3] == widths:
+                components = []
+                for value, convert in zip(values[1::3], converters):
+                    if convert is not None:
+                        value = convert(value)
+                    components.append(value)
+                return tuple(components)
+
         components = []
-        i = iter(unpackers)
-        while bytestr:
-            unpacker = i.next()
-            length = len_unpacker(bytestr[:2])
-            components.append(unpacker(bytestr[2:2 + length]))
-            bytestr = bytestr[3 + length:]
+        offset = 0
+        end = len(bytestr)
+        i = 0
+        while offset < end:
+            length = len_unpack_from(bytestr, offset)[0]
+            start = offset + 2
+            fixed = fixed_unpackers[i]
+            if fixed is not None and fixed[0] == length:
+                value = fixed[1](bytestr, start)[0]
+                if fixed[2] is not None:
+                    value = fixed[2](value)
+            else:
+                value = unpackers[i](bytestr[start:start + length])
+            components.append(value)
+            offset = start + length + 1
+            i += 1
         return tuple(components)
 
     return unpack_composite
 
-def get_dynamic_composite_packer(typestr):
+def _dynamic_composite_aliases(typestr):
+    """ Returns a dict mapping each alias to its full type string """
     cassandra_types = {}
     for inner_type in _get_inner_types(typestr):
         alias, cassandra_type = inner_type.split('=>')
         cassandra_types[alias] = cassandra_type
+    return cassandra_types
+
+def get_dynamic_composite_packer(typestr):
+    alias_packers = {}
+    for alias, cassandra_type in _dynamic_composite_aliases(typestr).items():
+        alias_packers[alias] = ('\x80' + alias, packer_for(cassandra_type))
 
     len_packer = _short_packer.pack
 
     def pack_dynamic_composite(items, slice_start=None):
         last_index = len(items) - 1
-        s = ''
+        parts = []
         i = 0
         for (alias, item) in items:
             eoc = '\x00'
@@ -176,8 +351,7 @@ def get_dynamic_composite_packer(typestr):
                 elif slice_start is False:
                     eoc = '\x01'
             if isinstance(alias, str) and len(alias) == 1:
-                header = '\x80' + alias
-                packer = packer_for(cassandra_types[alias])
+                header, packer = alias_packers[alias]
             else:
                 cassandra_type = str(alias).split('(')[0]
                 header = len_packer(len(cassandra_type)) + cassandra_type
@@ -185,18 +359,17 @@ def get_dynamic_composite_packer(typestr):
             i += 1
 
             packed = packer(item)
-            s += ''.join((header, len_packer(len(packed)), packed, eoc))
-        return s
+            parts.extend((header, len_packer(len(packed)), packed, eoc))
+        return ''.join(parts)
 
     return pack_dynamic_composite
 
 def get_dynamic_composite_unpacker(typestr):
-    cassandra_types = {}
-    for inner_type in _get_inner_types(typestr):
-        alias, cassandra_type = inner_type.split('=>')
-        cassandra_types[alias] = cassandra_type
+    alias_unpackers = {}
+    for alias, cassandra_type in _dynamic_composite_aliases(typestr).items():
+        alias_unpackers[alias] = unpacker_for(cassandra_type)
 
-    len_unpacker = lambda v: _short_packer.unpack(v)[0]
+    len_unpack_from = _short_packer.unpack_from
 
     def unpack_dynamic_composite(bytestr):
         # The composite format for each component is:
@@ -204,26 +377,32 @@ def get_dynamic_composite_unpacker(typestr):
         # ? bytes  |  2 bytes  |  ? bytes  |  1 byte
         types = []
         components = []
-        while bytestr:
-            header = len_unpacker(bytestr[:2])
+        offset = 0
+        end = len(bytestr)
+        while offset < end:
+            header = len_unpack_from(bytestr, offset)[0]
             if header & 0x8000:
-                alias = bytestr[1]
+                alias = bytestr[offset + 1]
                 types.append(alias)
-                unpacker = unpacker_for(cassandra_types[alias])
-                bytestr = bytestr[2:]
+                unpacker = alias_unpackers[alias]
+                offset += 2
             else:
-                cassandra_type = bytestr[2:2 + header]
+                cassandra_type = bytestr[offset + 2:offset + 2 + header]
                 types.append(cassandra_type)
                 unpacker = unpacker_for(cassandra_type)
-                bytestr = bytestr[2 + header:]
-            length = len_unpacker(bytestr[:2])
-            components.append(unpacker(bytestr[2:2 + length]))
-            bytestr = bytestr[3 + length:]
+                offset += 2 + header
+            length = len_unpack_from(bytestr, offset)[0]
+            start = offset + 2
+            components.append(unpacker(bytestr[start:start + length]))
+            offset = start + length + 1
         return tuple(zip(types, components))
 
     return unpack_dynamic_composite
 
 def packer_for(typestr):
+    return _cached(_packer_cache, _build_packer, typestr)
+
+def _build_packer(typestr):
     if typestr is None:
         return lambda v: v
 
@@ -292,10 +471,16 @@ def packer_for(typestr):
         return pack_utf8
 
     elif 'UUIDType' in data_type:
+        next_bytes = util._time_uuid_generator.next_bytes
+
         def pack_uuid(value, slice_start=None):
             if slice_start is None:
-                value = util.convert_time_to_uuid(value,
-                        randomize=True)
+                if isinstance(value, uuid.UUID):
+                    return value.bytes
+                elif value is not None:
+                    return next_bytes(value)
+                # convert_time_to_uuid() will reject None
+                value = util.convert_time_to_uuid(value, randomize=True)
             else:
                 value = util.convert_time_to_uuid(value,
                         lowest_val=slice_start,
@@ -320,7 +505,55 @@ def packer_for(typestr):
             return v
         return pack_bytes
 
+def bulk_packer_for(typestr=None, cassandra_type=None):
+    """
+    Like :func:`packer_for()`, but the returned function takes a
+    sequence of values and returns a list of their packed forms.
+
+    Fixed width numeric types are packed with a single call to
+    :func:`struct.pack` using a repeated format; other types fall
+    back to packing each value individually.  `cassandra_type` may
+    be a :class:`~pycassa.types.CassandraType` instance to use in
+    place of `typestr`.
+    """
+    if cassandra_type is not None:
+        packer = cassandra_type.pack
+        cls = cassandra_type.__class__
+        # Only trust the classes in pycassa.types not to override pack
+        if cls.__module__ == 'pycassa.types' and not hasattr(cls, 'pack'):
+            data_type = cls.__name__
+        else:
+            data_type = None
+    else:
+        packer = packer_for(typestr)
+        data_type = extract_type_name(typestr)
+
+    fmt = _FIXED_WIDTH_FORMATS.get(data_type)
+    if fmt is None or fmt == '16s':
+        def pack_each(values):
+            return map(packer, values)
+        return pack_each
+
+    if data_type == 'DateType':
+        convert = _to_timestamp
+    elif data_type == 'BooleanType':
+        convert = bool
+    else:
+        convert = None
+    width = struct.calcsize('>' + fmt)
+
+    def pack_all(values):
+        if convert is not None:
+            values = map(convert, values)
+        count = len(values)
+        packed = struct.pack('>%d%s' % (count, fmt), *values)
+        return [packed[i:i + width] for i in xrange(0, count * width, width)]
+    return pack_all
+
 def unpacker_for(typestr):
+    return _cached(_unpacker_cache, _build_unpacker, typestr)
+
+def _build_unpacker(typestr):
     if typestr is None:
         return lambda v: v
 
@@ -376,6 +609,76 @@ def unpacker_for(typestr):
     else:
         return lambda v: v
 
+# Big-endian numpy dtypes for the fixed-width types that can be decoded
+# in a single numpy.frombuffer() call
+_NUMPY_DTYPES = {'LongType': '>i8',
+                 'Int32Type': '>i4',
+                 'DoubleType': '>f8',
+                 'FloatType': '>f4',
+                 'DateType': '>i8',
+                 'BooleanType': '>u1'}
+
+def columnar_unpacker_for(typestr, unpacker=None):
+    """
+    Returns a function that converts a sequence of packed values of type
+    `typestr` into a single :class:`numpy.ndarray`.
+
+    Fixed-width types are decoded with one :func:`numpy.frombuffer` call
+    over the concatenated values.  ``DateType`` values become a
+    ``datetime64[ms]`` array and ``TimeUUIDType`` values become a
+    ``float64`` array of timestamps (as :func:`~.util.convert_uuid_to_time`
+    would return).  Any other type is decoded one value at a time into
+    an array of objects, using `unpacker` if it is given.
+
+    numpy must be installed to use this.
+    """
+    import numpy
+
+    data_type = extract_type_name(typestr)
+    if unpacker is None and data_type in _NUMPY_DTYPES:
+        dtype = numpy.dtype(_NUMPY_DTYPES[data_type])
+        native = dtype.newbyteorder('=')
+        if data_type == 'DateType':
+            convert = lambda arr: arr.astype(native).view('datetime64[ms]')
+        elif data_type == 'BooleanType':
+            convert = lambda arr: arr.astype(numpy.bool_)
+        else:
+            convert = lambda arr: arr.astype(native)
+
+        def unpack_fixed(values):
+            buf = ''.join(values)
+            if len(buf) != dtype.itemsize * len(values):
+                raise TypeError("Values of varying length cannot be "
+                                "converted to a type matching %s" % data_type)
+            return convert(numpy.frombuffer(buf, dtype))
+        return unpack_fixed
+
+    elif unpacker is None and data_type == 'TimeUUIDType':
+        dtype = numpy.dtype([('time_low', '>u4'), ('time_mid', '>u2'),
+                             ('time_hi_version', '>u2'), ('rest', 'V8')])
+
+        def unpack_time_uuid(values):
+            buf = ''.join(values)
+            if len(buf) != 16 * len(values):
+                raise TypeError("Values of varying length cannot be "
+                                "converted to a type matching TimeUUIDType")
+            fields = numpy.frombuffer(buf, dtype)
+            ts = (fields['time_hi_version'].astype(numpy.int64) & 0x0fff) << 48
+            ts |= fields['time_mid'].astype(numpy.int64) << 32
+            ts |= fields['time_low'].astype(numpy.int64)
+            return (ts - 0x01b21dd213814000L) / 1e7
+        return unpack_time_uuid
+
+    if unpacker is None:
+        unpacker = unpacker_for(typestr)
+
+    def unpack_objects(values):
+        arr = numpy.empty(len(values), dtype=object)
+        for i, v in enumerate(values):
+            arr[i] = unpacker(v)
+        return arr
+    return unpack_objects
+
 def encode_int(x, *args):
     if x >= 0:
         out = []
@@ -5,8 +5,12 @@ from __future__ import with_statement
 import time
 import threading
 import random
+import heapq
+import itertools
 import socket
 import sys
+import weakref
+from collections import deque
 
 if 'gevent.monkey' in sys.modules:
     from gevent import queue as Queue
@@ -16,17 +20,80 @@ else:
 from thrift import Thrift
 from thrift.transport.TTransport import TTransportException
 from connection import (Connection, default_socket_factory,
-        default_transport_factory)
+        default_transport_factory, DEFAULT_PORT)
+from logging.latency_stats_logger import LatencyHistogram
 from logging.pool_logger import PoolLogger
+from logging.pycassa_logger import PycassaLogger
 from util import as_interface
-from cassandra.ttypes import TimedOutException, UnavailableException
+from cassandra.ttypes import (TimedOutException, UnavailableException,
+        InvalidRequestException)
 
 _BASE_BACKOFF = 0.01
 
+# The most retries a pool with a retry budget may bank for a burst
+_RETRY_BUDGET_BURST = 10.0
+
+# Idempotent reads that may be sent to a second server
+_SPECULATIVE_METHODS = frozenset(['get', 'get_slice', 'multiget_slice', 'get_count'])
+
+# How long the thread that sends speculative reads waits for more work
+# before exiting
+_HEDGE_THREAD_IDLE = 10.0
+
+# Listener methods and the attributes holding their subscribers
+_LISTENER_EVENTS = (('connection_created', '_on_connect'),
+                    ('connection_checked_out', '_on_checkout'),
+                    ('connection_checked_in', '_on_checkin'),
+                    ('connection_disposed', '_on_dispose'),
+                    ('connection_recycled', '_on_recycle'),
+                    ('connection_failed', '_on_failure'),
+                    ('obtained_server_list', '_on_server_list'),
+                    ('pool_disposed', '_on_pool_dispose'),
+                    ('pool_at_max', '_on_pool_max'),
+                    ('connection_retried', '_on_retry'),
+                    ('request_finished', '_on_request'),
+                    ('pool_wait_exceeded', '_on_wait_exceeded'),
+                    ('pool_resized', '_on_resize'))
+
+# Pools whose listeners are recompiled when the log level changes, by id
+_live_pools = weakref.WeakValueDictionary()
+
+def _refresh_live_pools():
+    for pool in _live_pools.values():
+        pool.refresh_listeners()
+
+PycassaLogger().add_level_change_callback(_refresh_live_pools)
+
+def _invalidate_schema_caches():
+    """ Called by :class:`~.SystemManager` after each schema change. """
+    for pool in _live_pools.values():
+        pool.invalidate_schema_cache()
+
+# Number of recent latencies kept per method for speculative_percentile
+_LATENCY_WINDOW = 1000
+_LATENCY_MIN_SAMPLES = 100
+
 __all__ = ['QueuePool', 'ConnectionPool', 'PoolListener',
            'ConnectionWrapper', 'AllServersUnavailable',
            'MaximumRetryException', 'NoConnectionAvailable',
-           'InvalidRequestError']
+           'InvalidRequestError', 'DeadlineExceeded']
+
+class _HedgeWon(Exception):
+    """ Raised in place of a request that a speculative read beat. """
+    pass
+
+class _SpeculativeRead(object):
+    """ A read that a speculative request may be sent for. """
+
+    def __init__(self, f, args, kwargs, conn):
+        self.f = f
+        self.args = args
+        self.kwargs = kwargs
+        self.conn = conn
+        self.done = False
+        self.cancelled = False
+        self.hedge_done = None
+        self.hedge_outcome = None
 
 class ConnectionWrapper(Connection):
     """
@@ -45,12 +112,19 @@ class ConnectionWrapper(Connection):
     _CHECKED_OUT = 1
     _DISPOSED = 2
 
+    # Set when a speculative read has answered in place of this connection
+    _cancelled = False
+
     def __init__(self, pool, max_retries, *args, **kwargs):
         self._pool = pool
+        self._counted_server = None
         self._retry_count = 0
         self.max_retries = max_retries
         self.info = {}
         self.starttime = time.time()
+        self.last_used = self.starttime
+        self._last_keepalive = self.starttime
+        self._expires = pool._connection_expiry(self.starttime)
         self.operation_count = 0
         self._state = ConnectionWrapper._CHECKED_OUT
         Connection.__init__(self, *args, **kwargs)
@@ -98,6 +172,12 @@ class ConnectionWrapper(Connection):
         self.close()
         self._pool._notify_on_dispose(self, msg=reason)
 
+    def close(self):
+        Connection.close(self)
+        if self._counted_server is not None:
+            self._pool._count_connection(self._counted_server, -1)
+            self._counted_server = None
+
     def _replace(self, new_conn_wrapper):
         """
         Get another wrapper from the pool and replace our own contents
@@ -105,11 +185,18 @@ class ConnectionWrapper(Connection):
 
         """
         self.server = new_conn_wrapper.server
+        self._counted_server = new_conn_wrapper._counted_server
+        new_conn_wrapper._counted_server = None
         self.transport = new_conn_wrapper.transport
+        self._tsocket = new_conn_wrapper._tsocket
+        self._counter = new_conn_wrapper._counter
         self._iprot = new_conn_wrapper._iprot
         self._oprot = new_conn_wrapper._oprot
         self.info = new_conn_wrapper.info
         self.starttime = new_conn_wrapper.starttime
+        self.last_used = new_conn_wrapper.last_used
+        self._last_keepalive = new_conn_wrapper._last_keepalive
+        self._expires = new_conn_wrapper._expires
         self.operation_count = new_conn_wrapper.operation_count
         self._state = ConnectionWrapper._CHECKED_OUT
         self._should_fail = new_conn_wrapper._should_fail
@@ -118,16 +205,36 @@ class ConnectionWrapper(Connection):
     def _retry(cls, f):
         def new_f(self, *args, **kwargs):
             self.operation_count += 1
-            self.info['request'] = {'method': f.__name__, 'args': args, 'kwargs': kwargs}
+            allow_retries = kwargs.pop('allow_retries', True)
+            deadline = kwargs.pop('deadline', None)
+            start = None
             try:
-                allow_retries = kwargs.pop('allow_retries', True)
                 if kwargs.pop('reset', False):
+                    if self._cancelled:
+                        raise _HedgeWon()
                     self._pool._replace_wrapper() # puts a new wrapper in the queue
-                    self._replace(self._pool.get()) # swaps out transport
-                result = f(self, *args, **kwargs)
+                    self._replace(self._pool.get(deadline)) # swaps out transport
+                else:
+                    self._pool._deposit_retry_budget()
+                # Set after any _replace(), which also swaps out info
+                self.info['request'] = {'method': f.__name__, 'args': args, 'kwargs': kwargs}
+                if self._pool._on_request:
+                    start = (time.time(), self.bytes_sent, self.bytes_received)
+                tracer = self._pool.tracer
+                if tracer is None:
+                    result = self._attempt(f, args, kwargs, deadline)
+                else:
+                    with tracer.span('thrift.' + f.__name__,
+                                     {'pycassa.server': self.server,
+                                      'pycassa.attempt': self._retry_count}):
+                        result = self._attempt(f, args, kwargs, deadline)
+                if start is not None:
+                    self._request_finished(f.__name__, start)
                 self._retry_count = 0 # reset the count after a success
                 return result
             except Thrift.TApplicationException, app_exc:
+                if start is not None:
+                    self._request_finished(f.__name__, start, app_exc)
                 self.close()
                 self._pool._decrement_overflow()
                 self._pool._clear_current()
@@ -135,26 +242,85 @@ class ConnectionWrapper(Connection):
             except (TimedOutException, UnavailableException,
                     TTransportException,
                     socket.error, IOError, EOFError), exc:
-                self._pool._notify_on_failure(exc, server=self.server, connection=self)
+                if self._cancelled:
+                    # A speculative read answered and shut this socket down
+                    self.close()
+                    self._pool._decrement_overflow()
+                    self._pool._clear_current()
+                    raise _HedgeWon()
+                if start is not None:
+                    self._request_finished(f.__name__, start, exc)
+                # A timeout caused by the deadline says nothing about the server
+                expired = deadline is not None and time.time() >= deadline
+                if not expired:
+                    self._pool._notify_on_failure(exc, server=self.server, connection=self)
+                    if not isinstance(exc, (TimedOutException, UnavailableException)):
+                        self._pool._quarantine(self.server)
 
                 self.close()
                 self._pool._decrement_overflow()
                 self._pool._clear_current()
 
                 self._retry_count += 1
+                if expired:
+                    raise DeadlineExceeded('Deadline passed after %d attempts. Last failure was %s: %s' %
+                                           (self._retry_count, exc.__class__.__name__, exc))
                 if (not allow_retries or
                     (self.max_retries != -1 and self._retry_count > self.max_retries)):
                     raise MaximumRetryException('Retried %d times. Last failure was %s: %s' %
                                                 (self._retry_count, exc.__class__.__name__, exc))
-                # Exponential backoff
-                time.sleep(_BASE_BACKOFF * (2 ** self._retry_count))
+                # Exponential backoff with full jitter, so that clients
+                # which failed together don't retry together
+                delay = random.uniform(0, _BASE_BACKOFF * (2 ** self._retry_count))
+                if deadline is not None and time.time() + delay >= deadline:
+                    raise DeadlineExceeded('Deadline would pass before retry %d. Last failure was %s: %s' %
+                                           (self._retry_count, exc.__class__.__name__, exc))
+                if not self._pool._withdraw_retry_budget():
+                    self._pool._notify_on_retry(exc, self.server, self, delay, False)
+                    raise MaximumRetryException('Retry budget exhausted after %d attempts. Last failure was %s: %s' %
+                                                (self._retry_count, exc.__class__.__name__, exc))
+                self._pool._notify_on_retry(exc, self.server, self, delay, True)
+                if self._pool.tracer is None:
+                    time.sleep(delay)
+                else:
+                    with self._pool.tracer.span('pycassa.backoff',
+                                                {'pycassa.server': self.server,
+                                                 'pycassa.attempt': self._retry_count,
+                                                 'pycassa.delay': delay}):
+                        time.sleep(delay)
 
                 kwargs['reset'] = True
+                if deadline is not None:
+                    kwargs['deadline'] = deadline
                 return new_f(self, *args, **kwargs)
 
         new_f.__name__ = f.__name__
         return new_f
 
+    def _attempt(self, f, args, kwargs, deadline):
+        if deadline is None:
+            return f(self, *args, **kwargs)
+
+        # Don't let a single attempt outlive the deadline
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            raise DeadlineExceeded('Deadline passed after %d retries' %
+                                   self._retry_count)
+        if self._timeout is None or remaining < self._timeout:
+            self.set_timeout(remaining)
+            try:
+                return f(self, *args, **kwargs)
+            finally:
+                self.set_timeout(None)
+        return f(self, *args, **kwargs)
+
+    def _request_finished(self, method, start, error=None):
+        start_time, sent, received = start
+        self._pool._notify_on_request(method, self.server, self,
+                                      time.time() - start_time, error,
+                                      self.bytes_sent - sent,
+                                      self.bytes_received - received)
+
     def _fail_once(self, *args, **kwargs):
         if self._should_fail:
             self._should_fail = False
@@ -197,6 +363,22 @@ for fname in retryable:
     new_f = ConnectionWrapper._retry(getattr(Connection, fname))
     setattr(ConnectionWrapper, fname, new_f)
 
+def _maintenance_option(name):
+    """
+    A pool attribute that the maintenance thread acts on.  Assigning it
+    starts the thread, or restarts it on the new schedule.
+    """
+    private = '_' + name
+
+    def get(self):
+        return getattr(self, private)
+
+    def set(self, value):
+        setattr(self, private, value)
+        self._restart_maintenance()
+
+    return property(get, set)
+
 class ConnectionPool(object):
     """A pool that maintains a queue of open connections."""
 
@@ -244,6 +426,152 @@ class ConnectionPool(object):
     Setting this to 0 disables retries and setting to -1 allows unlimited retries.
     The default value is 5. """
 
+    _max_idle_time = -1
+    max_idle_time = _maintenance_option('max_idle_time')
+    """ Connections that have sat unused in the pool for more than
+    `max_idle_time` seconds are closed by the pool's maintenance thread.
+    This is useful when a firewall silently drops idle connections.
+    This may be set to -1 to disable idle connection reaping, which
+    is the default. """
+
+    _max_lifetime = -1
+    max_lifetime = _maintenance_option('max_lifetime')
+    """ Connections are replaced once they have been open for about
+    `max_lifetime` seconds: when they are checked in, or by the maintenance
+    thread if they are idle.  Each connection's lifetime is shortened by a
+    random amount of up to `max_lifetime_jitter` so that connections opened
+    together are not all replaced at once.  This may be set to -1 to disable
+    time based recycling, which is the default. """
+
+    max_lifetime_jitter = 0.1
+    """ The fraction of `max_lifetime` by which each connection's lifetime
+    may be randomly shortened.  The default value is 0.1. """
+
+    local_dc = None
+    """ The name of the datacenter that connections should be made to.
+    When this is set, the pool describes the ring when it is created to
+    learn which datacenter each node is in, and only opens connections to
+    nodes in other datacenters while every local node is quarantined.
+    Connections to remote nodes are closed as they are checked in once
+    a local node is available again.  By default, this is ``None`` and
+    every server is used. """
+
+    quarantine_time = 30
+    """ When :attr:`local_dc` is set, a server that a connection could not
+    be made to or that failed with a connection error is skipped for
+    `quarantine_time` seconds.  The default value is 30. """
+
+    _discovery_interval = -1
+    discovery_interval = _maintenance_option('discovery_interval')
+    """ If set, the pool's maintenance thread calls :meth:`discover_servers()`
+    every `discovery_interval` seconds, so that nodes which join or leave
+    the ring are picked up without restarting the client.  This may be set
+    to -1 to disable discovery, which is the default. """
+
+    _keepalive_interval = -1
+    keepalive_interval = _maintenance_option('keepalive_interval')
+    """ If a connection has been idle in the pool for `keepalive_interval`
+    seconds, the maintenance thread sends it a cheap ``describe_version``
+    request to keep it open, and replaces it if the request fails.
+    This may be set to -1 to disable keepalives, which is the default. """
+
+    fill_concurrency = 1
+    """ The number of connections :meth:`fill()` will open at once, each in
+    its own thread.  Raising this cuts the time taken to prefill a large pool
+    to roughly ``pool_size / fill_concurrency`` connection round trips.
+    The default value is 1. """
+
+    retry_budget = -1
+    """ If set, retries of failed operations are limited to this fraction of
+    the operations made through the pool; for example, 0.1 allows one retry
+    for every ten operations, plus a small reserve for bursts.  Once the
+    budget is spent, operations fail with :exc:`MaximumRetryException`
+    instead of being retried, which keeps retries from multiplying the load
+    on the remaining nodes during an outage.  This may be set to -1 to
+    disable the budget, which is the default. """
+
+    speculative_reads = False
+    """ Whether idempotent reads (``get``, ``get_slice``, ``multiget_slice``
+    and ``get_count``) made through :meth:`execute()` should be speculatively
+    retried.  If no response has arrived after :attr:`speculative_delay`
+    seconds, the same request is also sent over an idle connection to a
+    different server, and whichever response arrives first is used.  The
+    first attempt runs in the calling thread; a thread is only started
+    for each speculative request that is actually sent, and the first
+    attempt's connection is closed if the speculative request wins.
+    The default value is ``False``. """
+
+    speculative_delay = 0.05
+    """ The number of seconds to wait for a response before a speculative
+    read is sent.  The default value is 0.05. """
+
+    speculative_percentile = None
+    """ If set, the delay before a speculative read is sent is the latency
+    at this percentile (for example, 99) of recent requests of the same
+    type instead of :attr:`speculative_delay`, which is only used until
+    enough requests have been timed.  The default value is ``None``. """
+
+    speculative_max_ratio = 0.1
+    """ The largest fraction of reads that may be speculatively retried,
+    which caps the extra load placed on the cluster.  The default
+    value is 0.1. """
+
+    schema_cache = True
+    """ Whether keyspace descriptions fetched through
+    :meth:`get_keyspace_description()` should be cached and shared by
+    every :class:`~.ColumnFamily` using this pool.  A cached description
+    is reused without contacting Cassandra for
+    :attr:`schema_refresh_interval` seconds; after that, it is kept until
+    Cassandra reports a different schema version.  Schema changes made
+    through a :class:`~.SystemManager` in this process discard the cache
+    right away, and :meth:`invalidate_schema_cache()` may be called after
+    changes made elsewhere.  The default value is ``True``. """
+
+    schema_refresh_interval = 60
+    """ How long, in seconds, a cached keyspace description is used
+    before the schema versions are checked again; see
+    :attr:`schema_cache`.  Checking the versions makes the coordinator
+    contact every live node, so it is not done for each
+    :class:`~.ColumnFamily`.  The default value is 60. """
+
+    _min_pool_size = None
+    min_pool_size = _maintenance_option('min_pool_size')
+    """ The smallest size an adaptive pool may shrink to.  Setting this or
+    :attr:`max_pool_size` makes the pool adaptive: every
+    :attr:`resize_interval` seconds, its maintenance thread grows
+    `pool_size` if checkouts had to wait or overflow connections were
+    needed, and shrinks it if some connections sat idle the whole time.
+    The overflow limit moves with `pool_size`.  Each change is reported
+    through :meth:`PoolListener.pool_resized()`.  The default value is
+    ``None``; when only :attr:`max_pool_size` is set, the pool never shrinks
+    below its initial size. """
+
+    _max_pool_size = None
+    max_pool_size = _maintenance_option('max_pool_size')
+    """ The largest size an adaptive pool may grow to; see
+    :attr:`min_pool_size`.  The default value is ``None``; when only
+    :attr:`min_pool_size` is set, the pool never grows above its initial
+    size. """
+
+    _resize_interval = 30
+    resize_interval = _maintenance_option('resize_interval')
+    """ How often, in seconds, an adaptive pool considers resizing itself.
+    The default value is 30. """
+
+    wait_threshold = None
+    """ If set, a :meth:`PoolListener.pool_wait_exceeded()` event is sent
+    whenever a call to :meth:`get()` has been blocked for this many seconds
+    waiting for a connection to be returned to the pool.  Frequent events
+    are a sign that the pool should be larger, before :exc:`NoConnectionAvailable`
+    starts being raised.  The default value is ``None``. """
+
+    tracer = None
+    """ A :class:`~pycassa.tracing.Tracer` that receives a span for each
+    :class:`~.ColumnFamily` operation, with child spans for each Thrift call
+    attempt, each wait between retries, and any wait for a free connection.
+    See :mod:`pycassa.tracing`.  The default value is ``None``, which
+    disables tracing. """
+
     logging_name = None
     """ By default, each pool identifies itself in the logs using ``id(self)``.
     If multiple pools are in use for different purposes, setting `logging_name` will
@@ -316,7 +644,10 @@ class ConnectionPool(object):
         is disabled.
 
         If `prefill` is set to ``True``, `pool_size` connections will be opened
-        when the pool is created.
+        when the pool is created.  If the `background_fill` keyword argument is
+        also ``True``, they are opened by a background thread instead, and the
+        constructor returns immediately; requests made in the meantime wait
+        for the first connection to become ready.
 
         Example Usage:
 
@@ -339,21 +670,29 @@ class ConnectionPool(object):
             self._tlocal = threading.local()
 
         self._pool_size = pool_size
-        self._q = Queue.Queue(pool_size)
+        # Bounds an adaptive pool when min_pool_size or max_pool_size is unset
+        self._initial_pool_size = pool_size
+        # The idle connections and the connection count are both guarded
+        # by _pool_lock; _available is signalled whenever a connection is
+        # checked in or a slot is freed
+        self._idle = deque()
         self._pool_lock = threading.Lock()
+        self._available = threading.Condition(self._pool_lock)
+        self._waiters = 0
         self._current_conns = 0
+        self._wait_times = LatencyHistogram()
 
-        # Listener groups
+        # Demand since the last adaptive resize, all guarded by _pool_lock
+        self._peak_conns = 0
+        self._idle_low = 0
+        self._wait_count = 0
+
+        # Listener groups; these are replaced rather than modified, so
+        # they can be iterated over without holding _listener_lock
+        self._listener_lock = threading.Lock()
         self.listeners = []
-        self._on_connect = []
-        self._on_checkout = []
-        self._on_checkin = []
-        self._on_dispose = []
-        self._on_recycle = []
-        self._on_failure = []
-        self._on_server_list = []
-        self._on_pool_dispose = []
-        self._on_pool_max = []
+        self._compile_listeners()
+        _live_pools[id(self)] = self
 
         self.add_listener(PoolLogger())
 
@@ -369,16 +708,63 @@ class ConnectionPool(object):
         if "max_overflow" not in kwargs:
             self._set_max_overflow(0)
 
-        recognized_kwargs = ["pool_timeout", "recycle", "max_retries", "max_overflow"]
+        # keyspace -> (schema versions, {column_family_name: CfDef},
+        #              when the versions were last checked)
+        self._schema_cache = {}
+
+        # server -> number of open connections
+        self._server_counts = {}
+        self._server_counts_lock = threading.Lock()
+        self._preferred_servers = []
+        self._last_discovery = time.time()
+        self._last_resize = time.time()
+
+        # server -> datacenter, as learned from describe_ring
+        self._server_dcs = {}
+        # server -> time its quarantine ends
+        self._quarantined = {}
+
+        self._retry_budget_lock = threading.Lock()
+        self._retry_tokens = _RETRY_BUDGET_BURST
+
+        self._speculative_lock = threading.Lock()
+        # Reads waiting for their speculative delay, as a heap of
+        # (due, sequence, _SpeculativeRead); guarded by _hedge_cond
+        self._hedge_cond = threading.Condition()
+        self._hedge_queue = []
+        self._hedge_sequence = itertools.count()
+        self._hedge_thread = None
+        self._speculative_counts = {'reads': 0, 'hedges_issued': 0, 'hedges_won': 0}
+        self._latency_samples = {}
+        self._hedge_delays = {}
+
+        recognized_kwargs = ["pool_timeout", "recycle", "max_retries", "max_overflow",
+                             "schema_cache", "schema_refresh_interval",
+                             "fill_concurrency", "max_idle_time",
+                             "max_lifetime", "max_lifetime_jitter",
+                             "keepalive_interval", "discovery_interval",
+                             "local_dc", "quarantine_time", "speculative_reads",
+                             "speculative_delay", "speculative_percentile",
+                             "speculative_max_ratio", "retry_budget", "tracer",
+                             "wait_threshold", "min_pool_size", "max_pool_size",
+                             "resize_interval"]
         for kw in recognized_kwargs:
             if kw in kwargs:
                 setattr(self, kw, kwargs[kw])
 
         self.set_server_list(server_list)
 
+        if self.local_dc is not None:
+            self.discover_servers()
+
         self._prefill = prefill
         if self._prefill:
-            self.fill()
+            self.fill(background=kwargs.get("background_fill", False))
+
+        self._maintenance_lock = threading.Lock()
+        self._maintenance_thread = None
+        self._maintenance_stop = threading.Event()
+        self._start_maintenance()
 
     def set_server_list(self, server_list):
         """
@@ -390,14 +776,201 @@ class ConnectionPool(object):
         sequence of servers.
         """
         if callable(server_list):
-            self.server_list = list(server_list())
+            server_list = list(server_list())
         else:
-            self.server_list = list(server_list)
+            server_list = list(server_list)
 
-        random.shuffle(self.server_list)
+        random.shuffle(server_list)
+        self._server_set = frozenset(server_list)
+        self.server_list = server_list
         self._list_position = 0
+        self._preferred_servers = []
         self._notify_on_server_list(self.server_list)
 
+    def discover_servers(self):
+        """
+        Updates the server list with the nodes in the ring, as reported
+        by ``describe_ring`` (or ``describe_token_map`` when the ring can't
+        be described for this keyspace).  Nodes that are already in the
+        server list keep their port; each new node's rpc address is used
+        along with the port of the first configured server.
+
+        Servers that have joined the ring are tried first when new
+        connections are made, and idle connections are shifted onto them
+        from the other servers.  Connections to servers that have left the
+        ring are closed when idle or once they are checked back in.
+
+        This is called periodically when :attr:`discovery_interval` is set.
+        The new server list is returned.
+        """
+        self._last_discovery = time.time()
+
+        hosts = []
+        host_dcs = {}
+        try:
+            ring = self.execute('describe_ring', self.keyspace)
+        except (InvalidRequestException, Thrift.TApplicationException):
+            token_map = self.execute('describe_token_map')
+            hosts = token_map.values()
+        else:
+            for token_range in ring:
+                rpc_endpoints = token_range.rpc_endpoints or []
+                endpoint_dcs = {}
+                for details in token_range.endpoint_details or []:
+                    endpoint_dcs[details.host] = details.datacenter
+                for i, endpoint in enumerate(token_range.endpoints):
+                    host = endpoint
+                    if i < len(rpc_endpoints) and rpc_endpoints[i] not in ('', '0.0.0.0'):
+                        host = rpc_endpoints[i]
+                    hosts.append(host)
+                    if endpoint in endpoint_dcs:
+                        host_dcs[host] = endpoint_dcs[endpoint]
+
+        port = None
+        known_ports = {}
+        for server in self.server_list:
+            if ':' in server:
+                host, server_port = server.rsplit(':', 1)
+                server_port = int(server_port)
+                if port is None:
+                    port = server_port
+            else:
+                host, server_port = server, DEFAULT_PORT
+            known_ports.setdefault(host, server_port)
+        if port is None:
+            port = DEFAULT_PORT
+
+        servers = []
+        server_dcs = {}
+        for host in hosts:
+            server = "%s:%d" % (host, known_ports.get(host, port))
+            if server not in server_dcs:
+                servers.append(server)
+                server_dcs[server] = host_dcs.get(host)
+
+        if servers:
+            self._update_server_list(servers, server_dcs)
+        return self.server_list
+
+    def _update_server_list(self, servers, server_dcs):
+        """
+        Replaces the server list with `servers`, keeping the connections
+        to servers that remain in it.  `server_dcs` maps each server to
+        its datacenter.
+        """
+        with self._pool_lock:
+            self._server_dcs = server_dcs
+            new_set = frozenset(servers)
+            if new_set == self._server_set:
+                return
+
+            kept = [s for s in self.server_list if s in new_set]
+            added = [s for s in servers if s not in self._server_set]
+            removed = self._server_set - new_set
+            random.shuffle(added)
+
+            self._server_set = new_set
+            self.server_list = kept + added
+            self._list_position = len(kept)
+
+            # Move a fair share of connections onto the added servers by
+            # closing idle ones elsewhere; their replacements are opened
+            # to the added servers first
+            local_added = [s for s in added if self._is_local(s)]
+            local_count = len([s for s in self.server_list if self._is_local(s)])
+            per_server = self._current_conns // max(local_count, 1)
+            self._preferred_servers = local_added * per_server
+            to_move = [per_server * len(local_added)]
+            server_list = self.server_list
+
+        self._notify_on_server_list(server_list, added=added,
+                                    removed=sorted(removed))
+
+        def check(conn):
+            if conn.server in removed:
+                return "server was removed from the server list"
+            if to_move[0] > 0 and \
+                    self._server_counts.get(conn.server, 0) > per_server:
+                to_move[0] -= 1
+                return "rebalancing connections onto new servers"
+            return None
+
+        if self._sweep(check) and self._prefill:
+            self.fill()
+
+    def _is_local(self, server):
+        """ Servers in an unknown datacenter are treated as local. """
+        if self.local_dc is None:
+            return True
+        return self._server_dcs.get(server, self.local_dc) == self.local_dc
+
+    def _quarantine(self, server):
+        if self.local_dc is None or self.quarantine_time <= 0:
+            return
+        now = time.time()
+        # Replace rather than modify the dict so readers need no lock
+        quarantined = dict((s, t) for s, t in self._quarantined.items() if t > now)
+        quarantined[server] = now + self.quarantine_time
+        self._quarantined = quarantined
+
+    def _routable_servers(self, server_list):
+        """
+        Returns the servers that new connections should be made to: the
+        healthy local servers if there are any, then the healthy remote
+        servers, then all of them.
+        """
+        now = time.time()
+        quarantined = self._quarantined
+        healthy = [s for s in server_list if quarantined.get(s, 0) <= now]
+        local = [s for s in healthy if self._is_local(s)]
+        return local or healthy or server_list
+
+    def _local_available(self):
+        now = time.time()
+        quarantined = self._quarantined
+        for server in self.server_list:
+            if self._is_local(server) and quarantined.get(server, 0) <= now:
+                return True
+        return False
+
+    def connections_per_datacenter(self):
+        """
+        Returns a dictionary of the form ``{datacenter: connection_count}``
+        for the connections that are currently open, whether they are
+        checked out or not.  Servers in an unknown datacenter are counted
+        under ``None``.
+        """
+        counts = {}
+        for server, count in self._server_counts.items():
+            dc = self._server_dcs.get(server)
+            counts[dc] = counts.get(dc, 0) + count
+        return counts
+
+    def _deposit_retry_budget(self):
+        if self.retry_budget < 0:
+            return
+        with self._retry_budget_lock:
+            self._retry_tokens = min(self._retry_tokens + self.retry_budget,
+                                     _RETRY_BUDGET_BURST)
+
+    def _withdraw_retry_budget(self):
+        """ Returns ``False`` if the retry budget does not allow a retry. """
+        if self.retry_budget < 0:
+            return True
+        with self._retry_budget_lock:
+            if self._retry_tokens < 1:
+                return False
+            self._retry_tokens -= 1
+            return True
+
+    def _count_connection(self, server, delta):
+        with self._server_counts_lock:
+            count = self._server_counts.get(server, 0) + delta
+            if count > 0:
+                self._server_counts[server] = count
+            else:
+                self._server_counts.pop(server, None)
+
     def _get_next_server(self):
         """
         Gets the next 'localhost:port' combination from the list of
@@ -405,11 +978,20 @@ class ConnectionPool(object):
         but client-side load-balancing isn't so important that this is
         a problem.
         """
-        if self._list_position >= len(self.server_list):
-            self._list_position = 0
-        server = self.server_list[self._list_position]
-        self._list_position += 1
-        return server
+        if self._preferred_servers:
+            try:
+                return self._preferred_servers.pop()
+            except IndexError:
+                pass
+
+        server_list = self.server_list
+        if self.local_dc is not None:
+            server_list = self._routable_servers(server_list)
+        position = self._list_position
+        if position >= len(server_list):
+            position = 0
+        self._list_position = position + 1
+        return server_list[position]
 
     def _create_connection(self):
         """Creates a ConnectionWrapper, which opens a
@@ -421,27 +1003,85 @@ class ConnectionPool(object):
             try:
                 server = self._get_next_server()
                 wrapper = self._get_new_wrapper(server)
+                wrapper._counted_server = server
+                self._count_connection(server, 1)
                 return wrapper
             except (TTransportException, socket.error, IOError, EOFError), exc:
                 self._notify_on_failure(exc, server)
+                self._quarantine(server)
                 failure_count += 1
         raise AllServersUnavailable('An attempt was made to connect to each of the servers ' +
                                     'twice, but none of the attempts succeeded. The last failure was %s: %s' %
                                     (exc.__class__.__name__, exc))
 
-    def fill(self):
+    def fill(self, background=False):
         """
         Adds connections to the pool until at least ``pool_size`` connections
         exist, whether they are currently checked out from the pool or not.
 
+        Up to :attr:`fill_concurrency` connections are opened at once.
+        If `background` is ``True``, the connections are opened by a
+        background thread and this returns immediately.
+
         .. versionadded:: 1.2.0
         """
+        # Reserve the slots up front so that the lock isn't held
+        # while connecting
         with self._pool_lock:
-            while self._current_conns < self._pool_size:
-                conn = self._create_connection()
+            needed = self._pool_size - self._current_conns
+            if needed <= 0:
+                return
+            self._current_conns += needed
+
+        if background:
+            filler = threading.Thread(target=self._fill_reserved,
+                                      args=(needed, True))
+            filler.setDaemon(True)
+            filler.start()
+        else:
+            self._fill_reserved(needed)
+
+    def _fill_reserved(self, count, background=False):
+        """ Opens `count` connections for slots that are already reserved. """
+        errors = []
+
+        def open_connections(n):
+            for i in xrange(n):
+                try:
+                    conn = self._create_connection()
+                except Exception:
+                    # give back this slot and the ones we won't get to
+                    with self._pool_lock:
+                        self._current_conns -= n - i
+                        # waiting get()s may now open connections themselves
+                        if self._waiters:
+                            self._available.notify_all()
+                    errors.append(sys.exc_info())
+                    return
                 conn._checkin()
-                self._q.put(conn, False)
-                self._current_conns += 1
+                if not self._push_idle(conn):
+                    conn._dispose_wrapper(reason="pool is already full")
+                    self._decrement_overflow()
+
+        concurrency = max(1, min(self.fill_concurrency, count))
+        if concurrency == 1:
+            open_connections(count)
+        else:
+            threads = []
+            for i in range(concurrency):
+                n = count // concurrency + (i < count % concurrency)
+                t = threading.Thread(target=open_connections, args=(n,))
+                t.setDaemon(True)
+                t.start()
+                threads.append(t)
+            for t in threads:
+                t.join()
+
+        # _create_connection() has already reported the failures to
+        # the listeners, which is all that can be done in the background
+        if errors and not background:
+            exc_type, exc_value, exc_tb = errors[0]
+            raise exc_type, exc_value, exc_tb
 
     def _get_new_wrapper(self, server):
         return ConnectionWrapper(self, self.max_retries,
@@ -453,17 +1093,32 @@ class ConnectionPool(object):
 
     def _replace_wrapper(self):
         """Try to replace the connection."""
-        if not self._q.full():
+        if len(self._idle) < self._pool_size:
             conn = self._create_connection()
             conn._checkin()
 
-            try:
-                self._q.put(conn, False)
-            except Queue.Full:
-                conn._dispose_wrapper(reason="pool is already full")
-            else:
-                with self._pool_lock:
+            with self._pool_lock:
+                if len(self._idle) < self._pool_size:
+                    self._idle.append(conn)
                     self._current_conns += 1
+                    if self._waiters:
+                        self._available.notify()
+                    return
+            conn._dispose_wrapper(reason="pool is already full")
+
+    def _push_idle(self, conn):
+        """
+        Adds a checked in connection to the idle connections, returning
+        ``False`` if there are already `pool_size` of them.
+        """
+        with self._pool_lock:
+            if len(self._idle) >= self._pool_size:
+                return False
+            self._idle.append(conn)
+            # notify() is costly enough to skip when nobody is waiting
+            if self._waiters:
+                self._available.notify()
+            return True
 
     def _clear_current(self):
         """ If using threadlocal, clear our threadlocal current conn. """
@@ -486,7 +1141,20 @@ class ConnectionPool(object):
             if conn._is_in_queue_or_disposed():
                 raise InvalidRequestError("Connection was already checked in or disposed")
 
-            if self.recycle > -1 and conn.operation_count > self.recycle:
+            if conn.server not in self._server_set:
+                conn._dispose_wrapper(reason="server was removed from the server list")
+                self._decrement_overflow()
+                return
+            if (self.local_dc is not None and not self._is_local(conn.server)
+                    and self._local_available()):
+                conn._dispose_wrapper(reason="a server in the local datacenter is available")
+                self._decrement_overflow()
+                return
+
+            now = time.time()
+            conn.last_used = now
+            if ((self.recycle > -1 and conn.operation_count > self.recycle) or
+                    (conn._expires is not None and conn._expires <= now)):
                 new_conn = self._create_connection()
                 self._notify_on_recycle(conn, new_conn)
                 conn._dispose_wrapper(reason="recyling connection")
@@ -494,9 +1162,7 @@ class ConnectionPool(object):
             conn._checkin()
             self._notify_on_checkin(conn)
 
-            try:
-                self._q.put_nowait(conn)
-            except Queue.Full:
+            if not self._push_idle(conn):
                 conn._dispose_wrapper(reason="pool is already full")
                 self._decrement_overflow()
     return_conn = put
@@ -504,27 +1170,18 @@ class ConnectionPool(object):
     def _decrement_overflow(self):
         with self._pool_lock:
             self._current_conns -= 1
+            # a waiting get() may now open a connection of its own
+            if self._waiters:
+                self._available.notify()
 
-    def _new_if_required(self, max_conns, check_empty_queue=False):
-        """ Creates new connection if there is room """
-        with self._pool_lock:
-            if (not check_empty_queue or self._q.empty()) and self._current_conns < max_conns:
-                new_conn = True
-                self._current_conns += 1
-            else:
-                new_conn = False
-
-        if new_conn:
-            try:
-                return self._create_connection()
-            except:
-                with self._pool_lock:
-                    self._current_conns -= 1
-                raise
-        return None
+    def get(self, deadline=None):
+        """
+        Gets a connection from the pool.
 
-    def get(self):
-        """ Gets a connection from the pool. """
+        If `deadline`, an absolute time as returned by :func:`time.time()`,
+        is given, a checkout that has to wait for a connection gives up at
+        the deadline and raises :exc:`DeadlineExceeded`.
+        """
         conn = None
         if self._pool_threadlocal:
             try:
@@ -535,59 +1192,563 @@ class ConnectionPool(object):
             except AttributeError:
                 pass
 
-        conn = self._new_if_required(self._pool_size)
-        if not conn:
-            # if queue is empty and max_overflow is not reached, create new conn
-            conn = self._new_if_required(self._max_conns, check_empty_queue=True)
+        # Decide between an idle connection and a new one under a single
+        # acquisition of the lock; connections are opened outside of it
+        create = False
+        wait = False
+        with self._pool_lock:
+            if self._current_conns < self._pool_size:
+                self._current_conns += 1
+                create = True
+            elif self._idle:
+                conn = self._idle.popleft()
+                if len(self._idle) < self._idle_low:
+                    self._idle_low = len(self._idle)
+            elif self._current_conns < self._max_conns:
+                # if there are no idle connections and max_overflow
+                # is not reached, create new conn
+                self._current_conns += 1
+                create = True
+                self._idle_low = 0
+                if self._current_conns > self._peak_conns:
+                    self._peak_conns = self._current_conns
+            else:
+                wait = True
 
-        if not conn:
-            # We will have to fetch from the queue, and maybe block
-            timeout = self.pool_timeout
-            if timeout == -1:
-                timeout = None
+        if wait:
+            if self.tracer is None:
+                conn, create = self._wait_for_connection(deadline)
+            else:
+                with self.tracer.span('pycassa.pool_wait',
+                                      {'pycassa.pool_size': self._pool_size}) as span:
+                    conn, create = self._wait_for_connection(deadline)
+                    span.set_attribute('pycassa.obtained', conn is not None or create)
 
+        if create:
             try:
-                conn = self._q.get(timeout=timeout)
-            except Queue.Empty:
-                self._notify_on_pool_max(pool_max=self._max_conns)
-                size_msg = "size %d" % (self._pool_size, )
-                if self._overflow_enabled:
-                    size_msg += "overflow %d" % (self._max_overflow)
-                message = "ConnectionPool limit of %s reached, unable to obtain connection after %d seconds" \
-                          % (size_msg, self.pool_timeout)
-                raise NoConnectionAvailable(message)
-            else:
-                conn._checkout()
+                conn = self._create_connection()
+            except:
+                self._decrement_overflow()
+                raise
+        elif conn is None:
+            if deadline is not None and time.time() >= deadline:
+                raise DeadlineExceeded('Deadline passed while waiting for a connection')
+            self._notify_on_pool_max(pool_max=self._max_conns)
+            size_msg = "size %d" % (self._pool_size, )
+            if self._overflow_enabled:
+                size_msg += "overflow %d" % (self._max_overflow)
+            message = "ConnectionPool limit of %s reached, unable to obtain connection after %d seconds" \
+                      % (size_msg, self.pool_timeout)
+            raise NoConnectionAvailable(message)
+        else:
+            conn._checkout()
 
         if self._pool_threadlocal:
             self._tlocal.current = conn
         self._notify_on_checkout(conn)
         return conn
 
+    def _wait_for_connection(self, deadline=None):
+        """
+        Waits up to :attr:`pool_timeout`, or until `deadline` if that is
+        sooner, for a connection to be checked in or for room to open a
+        new one.  Returns a ``(connection, create)`` tuple; if `create` is
+        ``True``, room for a new connection has been reserved.
+        """
+        with self._pool_lock:
+            self._wait_count += 1
+            self._idle_low = 0
+
+        start = time.time()
+        endtime = None
+        if self.pool_timeout != -1:
+            endtime = start + self.pool_timeout
+        if deadline is not None and (endtime is None or deadline < endtime):
+            endtime = deadline
+        threshold = self.wait_threshold
+        if threshold is not None and (endtime is None or start + threshold < endtime):
+            conn, create = self._wait_until(start + threshold)
+            if conn is None and not create:
+                self._notify_on_wait_exceeded(time.time() - start)
+                conn, create = self._wait_until(endtime)
+        else:
+            conn, create = self._wait_until(endtime)
+        self._wait_times.record(time.time() - start)
+        return conn, create
+
+    def _wait_until(self, endtime):
+        with self._pool_lock:
+            while True:
+                if self._idle:
+                    return self._idle.popleft(), False
+                if self._current_conns < self._max_conns:
+                    self._current_conns += 1
+                    if self._current_conns > self._peak_conns:
+                        self._peak_conns = self._current_conns
+                    return None, True
+                if endtime is None:
+                    remaining = None
+                else:
+                    remaining = endtime - time.time()
+                    if remaining <= 0:
+                        return None, False
+                self._waiters += 1
+                try:
+                    self._available.wait(remaining)
+                finally:
+                    self._waiters -= 1
+
     def execute(self, f, *args, **kwargs):
         """
         Get a connection from the pool, execute
         `f` on it with `*args` and `**kwargs`, return the
         connection to the pool, and return the result of `f`.
+
+        If the keyword argument `timeout` is given, the whole operation,
+        including waiting for a connection, any retries and the backoff
+        between them, must complete
+        within that many seconds.  Socket timeouts are shortened to the
+        time that remains, and :exc:`DeadlineExceeded` is raised as soon
+        as the time runs out.  An absolute `deadline`, as returned by
+        :func:`time.time()`, may be passed instead so that several calls
+        can share one budget.
         """
+        timeout = kwargs.pop('timeout', None)
+        deadline = kwargs.pop('deadline', None)
+        if timeout is not None:
+            deadline = time.time() + timeout
+        if deadline is not None:
+            kwargs['deadline'] = deadline
+
+        if self.speculative_reads and f in _SPECULATIVE_METHODS:
+            return self._execute_speculative(f, args, kwargs)
+
         conn = None
         try:
-            conn = self.get()
+            conn = self.get(deadline)
             return getattr(conn, f)(*args, **kwargs)
         finally:
             if conn:
                 conn.return_to_pool()
 
-    def dispose(self):
-        """ Closes all checked in connections in the pool. """
-        while True:
+    def speculative_stats(self):
+        """
+        Returns a dictionary with the number of ``reads`` that were
+        eligible for speculative retries, the number of ``hedges_issued``,
+        and the number of ``hedges_won``, where the speculative request
+        answered first.
+        """
+        with self._speculative_lock:
+            return dict(self._speculative_counts)
+
+    def _execute_speculative(self, f, args, kwargs):
+        with self._speculative_lock:
+            self._speculative_counts['reads'] += 1
+
+        conn = self.get(kwargs.get('deadline'))
+        read = _SpeculativeRead(f, args, kwargs, conn)
+        self._schedule_hedge(read, time.time() + self._speculative_delay_for(f))
+        try:
+            start = time.time()
+            result = getattr(conn, f)(*args, **kwargs)
+            self._record_latency(f, time.time() - start)
+            outcome = (None, result)
+        except:
+            outcome = (sys.exc_info(), None)
+
+        with self._hedge_cond:
+            read.done = True
+            hedge_done = read.hedge_done
+            cancelled = read.cancelled
+
+        if cancelled:
+            # The speculative read shut this connection's socket down
+            if conn.transport.isOpen():
+                conn.close()
+                self._decrement_overflow()
+                self._clear_current()
+        else:
+            conn.return_to_pool()
+
+        # If the first attempt ran out of connections or retries, the
+        # speculative read may still succeed
+        exc_info = outcome[0]
+        if hedge_done is not None and exc_info is not None and issubclass(exc_info[0],
+                (_HedgeWon, MaximumRetryException, AllServersUnavailable,
+                 NoConnectionAvailable)):
+            hedge_done.wait()
+            if read.hedge_outcome[0] is None or exc_info[0] is _HedgeWon:
+                outcome = read.hedge_outcome
+                if outcome[0] is None:
+                    with self._speculative_lock:
+                        self._speculative_counts['hedges_won'] += 1
+
+        exc_info, result = outcome
+        if exc_info is not None:
+            raise exc_info[0], exc_info[1], exc_info[2]
+        return result
+
+    def _schedule_hedge(self, read, due):
+        with self._hedge_cond:
+            heapq.heappush(self._hedge_queue, (due, self._hedge_sequence.next(), read))
+            if self._hedge_thread is None:
+                self._hedge_thread = threading.Thread(target=_hedge_loop,
+                        args=(weakref.ref(self), self._hedge_cond, self._hedge_queue))
+                self._hedge_thread.setDaemon(True)
+                self._hedge_thread.start()
+            else:
+                self._hedge_cond.notify()
+
+    def _issue_hedge(self, read):
+        """ Sends a speculative request for `read` if a connection is free. """
+        conn = self._checkout_hedge((read.conn.server,))
+        if conn is None:
+            return
+        with self._hedge_cond:
+            if not read.done:
+                read.hedge_done = threading.Event()
+                t = threading.Thread(target=self._run_hedge, args=(read, conn))
+                t.setDaemon(True)
+                t.start()
+                return
+        # The first attempt finished while the connection was checked out
+        with self._speculative_lock:
+            self._speculative_counts['hedges_issued'] -= 1
+        conn.return_to_pool()
+
+    def _run_hedge(self, read, conn):
+        try:
+            if self._pool_threadlocal:
+                self._tlocal.current = conn
+            start = time.time()
+            result = getattr(conn, read.f)(*read.args, **read.kwargs)
+            self._record_latency(read.f, time.time() - start)
+            outcome = (None, result)
+        except:
+            outcome = (sys.exc_info(), None)
+        try:
+            conn.return_to_pool()
+        finally:
+            with self._hedge_cond:
+                read.hedge_outcome = outcome
+                if outcome[0] is None and not read.done:
+                    # Wake the caller, which is blocked reading the
+                    # first attempt's response
+                    read.cancelled = True
+                    read.conn._cancelled = True
+                    handle = getattr(read.conn._tsocket, 'handle', None)
+                    if handle is not None:
+                        try:
+                            handle.shutdown(socket.SHUT_RDWR)
+                        except socket.error:
+                            pass
+            read.hedge_done.set()
+
+    def _checkout_hedge(self, exclude):
+        """
+        Checks out an idle connection to a server not in `exclude`, or
+        returns ``None`` if there is none or the extra load cap has been
+        reached.  New connections are never opened for speculative reads.
+        """
+        with self._speculative_lock:
+            counts = self._speculative_counts
+            if counts['hedges_issued'] + 1 > self.speculative_max_ratio * counts['reads']:
+                return None
+            counts['hedges_issued'] += 1
+
+        hedge = None
+        with self._pool_lock:
+            for conn in self._idle:
+                if conn.server not in exclude and conn.transport.isOpen():
+                    hedge = conn
+                    self._idle.remove(conn)
+                    break
+
+        if hedge is None:
+            with self._speculative_lock:
+                self._speculative_counts['hedges_issued'] -= 1
+            return None
+        hedge._checkout()
+        self._notify_on_checkout(hedge)
+        return hedge
+
+    def _speculative_delay_for(self, f):
+        if self.speculative_percentile is None:
+            return self.speculative_delay
+        return self._hedge_delays.get(f, self.speculative_delay)
+
+    def _record_latency(self, f, elapsed):
+        if self.speculative_percentile is None:
+            return
+        with self._speculative_lock:
+            samples = self._latency_samples.get(f)
+            if samples is None:
+                samples = self._latency_samples[f] = deque(maxlen=_LATENCY_WINDOW)
+            samples.append(elapsed)
+            # Re-sorting every sample would be wasteful; the percentile
+            # drifts slowly, so refresh it about once per hundred requests
+            if len(samples) >= _LATENCY_MIN_SAMPLES and random.random() < 0.01:
+                ordered = sorted(samples)
+                index = int(len(ordered) * self.speculative_percentile / 100.0)
+                self._hedge_delays[f] = ordered[min(index, len(ordered) - 1)]
+
+    def get_keyspace_description(self, keyspace=None):
+        """
+        Describes `keyspace`, which defaults to the pool's keyspace.
+
+        A dictionary of the form ``{column_family_name: CfDef}`` is returned,
+        where the column metadata of each ``CfDef`` is a dictionary.
+
+        If :attr:`schema_cache` is enabled, the description is cached
+        along with the schema versions reported by Cassandra.  The cached
+        description is returned without contacting Cassandra for
+        :attr:`schema_refresh_interval` seconds, and after that it is only
+        fetched again once the versions change.  The ``CfDef`` objects are
+        shared, so they should not be modified.
+
+        """
+        if keyspace is None:
+            keyspace = self.keyspace
+
+        if not self.schema_cache:
+            return self.execute('get_keyspace_description', keyspace,
+                                use_dict_for_col_metadata=True)
+
+        cached = self._schema_cache.get(keyspace)
+        now = time.time()
+        if cached is not None and now - cached[2] < self.schema_refresh_interval:
+            return cached[1]
+
+        versions = self.execute('describe_schema_versions')
+        versions = tuple(sorted(v for v in versions if v != 'UNREACHABLE'))
+        if cached is not None and cached[0] == versions:
+            self._schema_cache[keyspace] = (versions, cached[1], now)
+            return cached[1]
+
+        cf_defs = self.execute('get_keyspace_description', keyspace,
+                               use_dict_for_col_metadata=True)
+        self._schema_cache[keyspace] = (versions, cf_defs, now)
+        return cf_defs
+
+    def invalidate_schema_cache(self, keyspace=None):
+        """
+        Discards the cached description of `keyspace`, or of every keyspace
+        if `keyspace` is ``None``.
+        """
+        if keyspace is None:
+            self._schema_cache.clear()
+        else:
+            self._schema_cache.pop(keyspace, None)
+
+    def _connection_expiry(self, starttime):
+        """ Returns when a connection opened at `starttime` should be replaced. """
+        if self.max_lifetime is None or self.max_lifetime < 0:
+            return None
+        jitter = random.random() * self.max_lifetime_jitter
+        return starttime + self.max_lifetime * (1 - jitter)
+
+    def _maintenance_interval(self):
+        """
+        Returns how often the maintenance thread should run, or ``None``
+        if there is nothing for it to do.
+        """
+        periods = [p for p in (self.max_idle_time, self.max_lifetime,
+                               self.keepalive_interval)
+                   if p is not None and p > 0]
+        if self.discovery_interval is not None and self.discovery_interval > 0:
+            periods.append(self.discovery_interval)
+        interval = None
+        if periods:
+            interval = min(min(periods) / 2.0, 30.0)
+        if self._is_adaptive():
+            # Resizing waits for a full interval of demand, so there is
+            # no need to check any more often than that
+            interval = min(interval or self.resize_interval, self.resize_interval)
+        return interval
+
+    def _start_maintenance(self):
+        if self._maintenance_interval() is None:
+            return
+        self._maintenance_thread = threading.Thread(target=_maintenance_loop,
+                args=(weakref.ref(self), self._maintenance_stop))
+        self._maintenance_thread.setDaemon(True)
+        self._maintenance_thread.start()
+
+    def _restart_maintenance(self):
+        # Options passed to __init__ are set before the thread first starts
+        if getattr(self, '_maintenance_stop', None) is None:
+            return
+        with self._maintenance_lock:
+            if self._maintenance_stop.isSet():
+                # the pool has been disposed
+                return
+            thread = self._maintenance_thread
+            if thread is not None and thread.isAlive():
+                # Stop the running thread so the new schedule applies now
+                self._maintenance_stop.set()
+                self._maintenance_stop = threading.Event()
+            self._start_maintenance()
+
+    def _maintain(self):
+        """
+        Runs server discovery and adaptive resizing when they are due, then
+        closes idle and expired connections and sends keepalives.
+        """
+        if self._is_adaptive() and time.time() - self._last_resize >= self.resize_interval:
+            self._adapt_size()
+
+        if (self.discovery_interval is not None and self.discovery_interval > 0 and
+                time.time() - self._last_discovery >= self.discovery_interval):
+            try:
+                self.discover_servers()
+            except Exception, exc:
+                # Try again at the next interval
+                self._notify_on_failure(exc, server=None)
+
+        if not (self.max_idle_time > 0 or self.keepalive_interval > 0 or
+                (self.max_lifetime is not None and self.max_lifetime > 0)):
+            return
+
+        idle_reason = "connection was idle for too long"
+
+        def check(conn):
+            now = time.time()
+            if conn._expires is not None and conn._expires <= now:
+                return "connection reached its max lifetime"
+            elif self.max_idle_time > 0 and now - conn.last_used > self.max_idle_time:
+                return idle_reason
+            elif (self.keepalive_interval > 0 and
+                    now - max(conn.last_used, conn._last_keepalive) > self.keepalive_interval):
+                try:
+                    conn.describe_version()
+                    conn._last_keepalive = time.time()
+                except (Thrift.TException, socket.error, IOError, EOFError), exc:
+                    self._notify_on_failure(exc, server=conn.server, connection=conn)
+                    return "keepalive failed"
+            return None
+
+        # Idle connections are not replaced, but the others are, so
+        # that checkouts don't have to open them
+        reasons = self._sweep(check)
+        if self._prefill and [r for r in reasons if r != idle_reason]:
             try:
-                conn = self._q.get(False)
-                conn._dispose_wrapper(
-                        reason="Pool %s is being disposed" % id(self))
+                self.fill()
+            except Exception, exc:
+                # The servers may be down; try again at the next run
+                self._notify_on_failure(exc, server=None)
+
+    def _is_adaptive(self):
+        return self.min_pool_size is not None or self.max_pool_size is not None
+
+    def _adapt_size(self):
+        """
+        Resizes the pool based on the demand seen since the last call:
+        it grows when checkouts had to wait or overflow connections were
+        opened, and shrinks when some connections were idle throughout.
+        """
+        self._last_resize = time.time()
+        with self._pool_lock:
+            peak, self._peak_conns = self._peak_conns, self._current_conns
+            idle_low, self._idle_low = self._idle_low, len(self._idle)
+            waits, self._wait_count = self._wait_count, 0
+
+        size = self._pool_size
+        initial = self._initial_pool_size
+        if self.min_pool_size is None:
+            lowest = min(initial, self.max_pool_size)
+        else:
+            lowest = self.min_pool_size
+        if self.max_pool_size is None:
+            highest = max(initial, lowest)
+        else:
+            highest = self.max_pool_size
+        if (waits or peak > size) and size < highest:
+            # Take in the overflow that was used, or grow by a quarter
+            # if checkouts were waiting on a pool at its limit
+            new_size = min(highest, max(peak, size + max(1, size // 4)))
+            reason = ("%d checkouts waited" % waits if waits else
+                      "%d overflow connections were used" % (peak - size))
+        elif not waits and idle_low > 0 and size > lowest:
+            # Shed half of the connections that were never needed
+            new_size = max(lowest, size - max(1, idle_low // 2))
+            reason = "%d connections were idle" % idle_low
+        else:
+            return
+        self.resize(new_size, reason)
+
+    def resize(self, pool_size, reason=None):
+        """
+        Changes :meth:`size()` to `pool_size`.  The overflow limit moves by
+        the same amount.  When the pool shrinks, idle connections beyond
+        the new size are closed, and checked out connections are closed as
+        they are returned.  Adaptive pools call this themselves; see
+        :attr:`min_pool_size`.
+        """
+        surplus = []
+        with self._pool_lock:
+            old_size = self._pool_size
+            if pool_size == old_size:
+                return
+            self._pool_size = pool_size
+            if self._max_overflow != -1:
+                self._max_conns = pool_size + self._max_overflow
+            while len(self._idle) > pool_size:
+                surplus.append(self._idle.popleft())
+            # Connections above the new size are on their way out, so
+            # they say nothing about demand
+            self._peak_conns = min(self._peak_conns, pool_size)
+            self._idle_low = min(self._idle_low, pool_size)
+            if self._waiters and pool_size > old_size:
+                self._available.notify_all()
+
+        for conn in surplus:
+            conn._dispose_wrapper(reason="pool was resized to %d" % pool_size)
+            self._decrement_overflow()
+        self._notify_on_resize(old_size, pool_size, reason)
+        if self._prefill and pool_size > old_size:
+            self.fill(background=True)
+
+    def _sweep(self, check):
+        """
+        Takes each connection that is currently in the queue out once and
+        passes it to `check`.  If that returns a reason, the connection is
+        disposed of; otherwise it goes back in the queue.  Returns the list
+        of reasons for the connections that were disposed.
+        """
+        reasons = []
+        for i in xrange(len(self._idle)):
+            with self._pool_lock:
+                if not self._idle:
+                    break
+                conn = self._idle.popleft()
+            conn._checkout()
+
+            reason = check(conn)
+            if reason is not None:
+                reasons.append(reason)
+                conn._dispose_wrapper(reason=reason)
                 self._decrement_overflow()
-            except Queue.Empty:
-                break
+                continue
+
+            conn._checkin()
+            if not self._push_idle(conn):
+                conn._dispose_wrapper(reason="pool is already full")
+                self._decrement_overflow()
+        return reasons
+
+    def dispose(self):
+        """ Closes all checked in connections in the pool. """
+        with self._maintenance_lock:
+            self._maintenance_stop.set()
+        with self._hedge_cond:
+            self._hedge_cond.notify()
+        with self._pool_lock:
+            conns = list(self._idle)
+            self._idle.clear()
+        for conn in conns:
+            conn._dispose_wrapper(
+                    reason="Pool %s is being disposed" % id(self))
+            self._decrement_overflow()
 
         self._notify_on_pool_dispose()
 
@@ -597,7 +1758,7 @@ class ConnectionPool(object):
 
     def checkedin(self):
         """ Returns the number of connections currently in the pool. """
-        return self._q.qsize()
+        return len(self._idle)
 
     def overflow(self):
         """ Returns the number of overflow connections that are currently open. """
@@ -607,6 +1768,20 @@ class ConnectionPool(object):
         """ Returns the number of connections currently checked out from the pool. """
         return self._current_conns - self.checkedin()
 
+    def waiters(self):
+        """ Returns the number of threads blocked in :meth:`get()` waiting for a connection. """
+        return self._waiters
+
+    def wait_stats(self, reset=False):
+        """
+        Returns a summary of the time spent by :meth:`get()` blocked on
+        an exhausted pool, in the form returned by
+        :meth:`~pycassa.logging.latency_stats_logger.LatencyHistogram.summary()`.
+        Checkouts that did not have to wait are not counted.  If `reset`
+        is ``True``, the times are discarded once they are read.
+        """
+        return self._wait_times.copy(reset).summary()
+
     def add_listener(self, listener):
         """
         Add a :class:`PoolListener`-like object to this pool.
@@ -615,34 +1790,63 @@ class ConnectionPool(object):
         :class:`PoolListener`, or a dictionary of callables containing implementations
         of some or all of the named methods in :class:`PoolListener`.
 
+        The listener object is returned; if `listener` is a dictionary, this
+        is the object to pass to :meth:`remove_listener()`.
+
         """
 
         listener = as_interface(listener,
-            methods=('connection_created', 'connection_checked_out',
-                     'connection_checked_in', 'connection_disposed',
-                     'connection_recycled', 'connection_failed',
-                     'obtained_server_list', 'pool_disposed',
-                     'pool_at_max'))
-
-        self.listeners.append(listener)
-        if hasattr(listener, 'connection_created'):
-            self._on_connect.append(listener)
-        if hasattr(listener, 'connection_checked_out'):
-            self._on_checkout.append(listener)
-        if hasattr(listener, 'connection_checked_in'):
-            self._on_checkin.append(listener)
-        if hasattr(listener, 'connection_disposed'):
-            self._on_dispose.append(listener)
-        if hasattr(listener, 'connection_recycled'):
-            self._on_recycle.append(listener)
-        if hasattr(listener, 'connection_failed'):
-            self._on_failure.append(listener)
-        if hasattr(listener, 'obtained_server_list'):
-            self._on_server_list.append(listener)
-        if hasattr(listener, 'pool_disposed'):
-            self._on_pool_dispose.append(listener)
-        if hasattr(listener, 'pool_at_max'):
-            self._on_pool_max.append(listener)
+            methods=[event for event, attr in _LISTENER_EVENTS])
+
+        with self._listener_lock:
+            self.listeners = self.listeners + [listener]
+            self._compile_listeners()
+        return listener
+
+    def remove_listener(self, listener):
+        """
+        Removes a listener that was added with :meth:`add_listener()`
+        or passed to the constructor.  Raises :exc:`ValueError` if
+        `listener` is not one of the pool's listeners.
+
+        """
+        with self._listener_lock:
+            if listener not in self.listeners:
+                raise ValueError("%r is not a listener of this pool" % (listener,))
+            self.listeners = [l for l in self.listeners if l is not listener]
+            self._compile_listeners()
+
+    def refresh_listeners(self):
+        """
+        Recomputes which listeners each event is delivered to.
+
+        A listener may define an ``enabled_events()`` method that returns
+        the names of the events it currently wants; :class:`PoolLogger`
+        uses this to skip events below the effective log level, so that
+        they cost nothing.  Changing the level through :class:`PycassaLogger`
+        refreshes every pool automatically, but this should be called after
+        changing the level of the ``pycassa`` loggers in any other way.
+
+        """
+        with self._listener_lock:
+            self._compile_listeners()
+
+    def _compile_listeners(self):
+        enabled = {}
+        for listener in self.listeners:
+            enabled_events = getattr(listener, 'enabled_events', None)
+            if enabled_events is not None:
+                enabled[id(listener)] = set(enabled_events())
+
+        for event, attr in _LISTENER_EVENTS:
+            subscribers = []
+            for listener in self.listeners:
+                if not hasattr(listener, event):
+                    continue
+                if id(listener) in enabled and event not in enabled[id(listener)]:
+                    continue
+                subscribers.append(listener)
+            setattr(self, attr, tuple(subscribers))
 
     def _notify_on_pool_dispose(self):
         if self._on_pool_dispose:
@@ -659,6 +1863,26 @@ class ConnectionPool(object):
             for l in self._on_pool_max:
                 l.pool_at_max(dic)
 
+    def _notify_on_wait_exceeded(self, wait):
+        if self._on_wait_exceeded:
+            dic = {'pool_id': self.logging_name,
+                   'level': 'warn',
+                   'wait': wait,
+                   'waiters': self._waiters,
+                   'pool_max': self._max_conns}
+            for l in self._on_wait_exceeded:
+                l.pool_wait_exceeded(dic)
+
+    def _notify_on_resize(self, old_size, new_size, reason):
+        if self._on_resize:
+            dic = {'pool_id': self.logging_name,
+                   'level': 'info',
+                   'old_size': old_size,
+                   'new_size': new_size,
+                   'reason': reason}
+            for l in self._on_resize:
+                l.pool_resized(dic)
+
     def _notify_on_dispose(self, conn_record, msg=""):
         if self._on_dispose:
             dic = {'pool_id': self.logging_name,
@@ -669,10 +1893,13 @@ class ConnectionPool(object):
             for l in self._on_dispose:
                 l.connection_disposed(dic)
 
-    def _notify_on_server_list(self, server_list):
+    def _notify_on_server_list(self, server_list, added=None, removed=None):
         dic = {'pool_id': self.logging_name,
                'level': 'debug',
                'server_list': server_list}
+        if added is not None:
+            dic['added'] = added
+            dic['removed'] = removed
         if self._on_server_list:
             for l in self._on_server_list:
                 l.obtained_server_list(dic)
@@ -725,8 +1952,106 @@ class ConnectionPool(object):
             for l in self._on_failure:
                 l.connection_failed(dic)
 
+    def _notify_on_request(self, method, server, connection, elapsed, error=None,
+                           bytes_sent=0, bytes_received=0):
+        dic = {'pool_id': self.logging_name,
+               'level': 'debug',
+               'method': method,
+               'server': server,
+               'connection': connection,
+               'elapsed': elapsed,
+               'error': error,
+               'bytes_sent': bytes_sent,
+               'bytes_received': bytes_received}
+        for l in self._on_request:
+            l.request_finished(dic)
+
+    def _notify_on_retry(self, error, server, connection, delay, allowed):
+        if self._on_retry:
+            dic = {'pool_id': self.logging_name,
+                   'level': 'info' if allowed else 'warn',
+                   'error': error,
+                   'server': server,
+                   'connection': connection,
+                   'delay': delay,
+                   'allowed': allowed}
+            for l in self._on_retry:
+                l.connection_retried(dic)
+
 QueuePool = ConnectionPool
 
+def _hedge_loop(pool_ref, cond, queue):
+    """
+    Sends a speculative request for each read in `queue` that is still
+    waiting for a response once its delay has passed.  The thread exits
+    after it has had nothing to do for a while or once the pool is
+    disposed, and is started again by the next speculative read.
+    """
+    idle_since = time.time()
+    while True:
+        with cond:
+            while True:
+                now = time.time()
+                while queue and queue[0][2].done:
+                    heapq.heappop(queue)
+                if queue:
+                    idle_since = now
+                    if queue[0][0] <= now:
+                        read = heapq.heappop(queue)[2]
+                        break
+                    cond.wait(queue[0][0] - now)
+                else:
+                    pool = pool_ref()
+                    if (pool is None or pool._maintenance_stop.isSet() or
+                            now - idle_since >= _HEDGE_THREAD_IDLE):
+                        if pool is not None:
+                            pool._hedge_thread = None
+                        return
+                    del pool
+                    cond.wait(_HEDGE_THREAD_IDLE)
+
+        pool = pool_ref()
+        if pool is None:
+            return
+        pool._issue_hedge(read)
+        del pool
+
+def _maintenance_loop(pool_ref, stop_event):
+    """
+    Runs a pool's periodic maintenance until the pool is disposed.  Only
+    a weak reference to the pool is kept between runs so that the thread
+    does not keep an abandoned pool alive.
+    """
+    while True:
+        pool = pool_ref()
+        if pool is None:
+            return
+        interval = pool._maintenance_interval()
+        del pool
+        if interval is None:
+            return
+
+        stop_event.wait(interval)
+        if stop_event.isSet():
+            return
+
+        pool = pool_ref()
+        if pool is None:
+            return
+        try:
+            pool._maintain()
+        except Exception, exc:
+            # module globals are cleared at interpreter shutdown
+            if time is None:
+                return
+            # Keep running so that a failure while the servers are down
+            # doesn't stop maintenance for good
+            try:
+                pool._notify_on_failure(exc, server=None)
+            except Exception:
+                pass
+        del pool
+
 class PoolListener(object):
     """Hooks into the lifecycle of connections in a :class:`ConnectionPool`.
 
@@ -827,6 +2152,10 @@ class PoolListener(object):
         ``dic['server_list']``: The randomly permuted list of servers that the
         pool will choose from.
 
+        When the list changes because of :meth:`ConnectionPool.discover_servers()`,
+        ``dic['added']`` and ``dic['removed']`` list the servers that joined
+        and left.
+
         Fields: `pool_id`, `level`, and `server_list`.
         """
 
@@ -847,6 +2176,70 @@ class PoolListener(object):
         Fields: `pool_id`, `pool_max`, and `level`.
         """
 
+    def pool_wait_exceeded(self, dic):
+        """
+        Called when a request for a connection has been waiting for
+        :attr:`ConnectionPool.wait_threshold` seconds on an exhausted
+        pool.  The request keeps waiting afterwards.
+
+        ``dic['wait']``: The number of seconds the request has waited.
+
+        ``dic['waiters']``: The number of other requests that are waiting.
+
+        ``dic['pool_max']``: The max number of connections the pool will
+        keep open at one time.
+
+        Fields: `pool_id`, `level`, `wait`, `waiters`, and `pool_max`.
+        """
+
+    def pool_resized(self, dic):
+        """
+        Called when the size of the pool changes, either through
+        :meth:`ConnectionPool.resize()` or because the pool is adaptive.
+
+        ``dic['old_size']``: The previous size of the pool.
+
+        ``dic['new_size']``: The new size of the pool.
+
+        ``dic['reason']``: Why the pool was resized, or ``None``.
+
+        Fields: `pool_id`, `level`, `old_size`, `new_size`, and `reason`.
+        """
+
+    def connection_retried(self, dic):
+        """
+        Called when an operation that failed is about to be retried, or
+        would have been if the pool's retry budget had not been spent.
+
+        ``dic['delay']``: The number of seconds the retry waits for.
+
+        ``dic['allowed']``: ``False`` if the retry budget was exhausted,
+        in which case the operation fails instead.
+
+        Fields: `pool_id`, `level`, `error`, `server`, `connection`,
+        `delay`, and `allowed`.
+        """
+
+    def request_finished(self, dic):
+        """
+        Called after each attempt at a Thrift call, whether it succeeded
+        or not.  The time is only measured while at least one listener
+        implements this method.
+
+        ``dic['method']``: The name of the Thrift method, such as ``get_slice``.
+
+        ``dic['elapsed']``: The number of seconds the attempt took.
+
+        ``dic['error']``: The exception the attempt failed with, or ``None``.
+
+        ``dic['bytes_sent']``: The bytes written to the socket by the attempt.
+
+        ``dic['bytes_received']``: The bytes read from the socket by the attempt.
+
+        Fields: `pool_id`, `level`, `method`, `server`, `connection`,
+        `elapsed`, `error`, `bytes_sent`, and `bytes_received`.
+        """
+
 
 class AllServersUnavailable(Exception):
     """Raised when none of the servers given to a pool can be connected to."""
@@ -861,6 +2254,12 @@ class MaximumRetryException(Exception):
     the retries do not have to be on the same operation.
     """
 
+class DeadlineExceeded(Exception):
+    """
+    Raised when an operation's `timeout` or `deadline` passes before
+    the operation, including its retries, has completed.
+    """
+
 class InvalidRequestError(Exception):
     """
     Pycassa was asked to do something it can't do.
@@ -5,6 +5,7 @@ from pycassa.connection import (Connection, default_socket_factory,
 from pycassa.cassandra.ttypes import IndexType, KsDef, CfDef, ColumnDef,\
                                      SchemaDisagreementException
 import pycassa.marshal as marshal
+from pycassa.pool import _invalidate_schema_caches
 import pycassa.types as types
 
 _DEFAULT_TIMEOUT = 30
@@ -461,4 +462,6 @@ class SystemManager(object):
                 self._wait_for_agreement()
             else:
                 break
+        # Cached keyspace descriptions in this process are now out of date
+        _invalidate_schema_caches()
         return schema_version
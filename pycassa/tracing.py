@@ -0,0 +1,144 @@
+"""
+Hooks for tracing operations through a distributed tracing system.
+
+A :class:`~pycassa.pool.ConnectionPool` created with a `tracer` opens
+a span for each :class:`~pycassa.columnfamily.ColumnFamily` operation
+and batch send, with a child span for each attempt at a Thrift call,
+for each wait between retries, and for any time spent waiting for a
+connection to be checked in to an exhausted pool.  This separates time
+lost to pool starvation from time spent on the servers.
+
+Spans are named and tagged as follows:
+
+===================== ===================================================
+Span                  Attributes
+===================== ===================================================
+``ColumnFamily.<op>`` ``db.system``, ``db.name`` (the keyspace),
+                      ``db.cassandra.table``, ``db.operation`` and, for
+                      paging reads, ``pycassa.page``
+``Mutator.send``      ``db.system``, ``db.name``, ``db.operation`` and
+                      ``pycassa.mutations`` (the number of rows)
+``thrift.<method>``   ``pycassa.server`` and ``pycassa.attempt``
+``pycassa.backoff``   ``pycassa.server``, ``pycassa.attempt`` and
+                      ``pycassa.delay``
+``pycassa.pool_wait`` ``pycassa.pool_size`` and ``pycassa.obtained``
+===================== ===================================================
+
+Paging reads that return generators, such as
+:meth:`~pycassa.columnfamily.ColumnFamily.get_range()`,
+:meth:`~pycassa.columnfamily.ColumnFamily.get_indexed_slices()`,
+:meth:`~pycassa.columnfamily.ColumnFamily.xget()` and
+:meth:`~pycassa.columnfamily.ColumnFamily.xmultiget()`, open one span for
+each page they fetch, numbered from 0 by ``pycassa.page``, rather than
+one span for the whole iteration.  This keeps a span from staying open
+while the caller consumes rows, and time spent between pages is not
+attributed to Cassandra.
+
+A tracer only has to implement :meth:`Tracer.span()`.
+"""
+
+import functools
+
+__all__ = ['Span', 'Tracer', 'OpenTelemetryTracer']
+
+
+class Span(object):
+    """
+    A span that records nothing.  Spans returned by :meth:`Tracer.span()`
+    must be context managers with these methods.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        return False
+
+    def set_attribute(self, key, value):
+        """ Sets an attribute of the span. """
+        pass
+
+    def add_event(self, name, attributes=None):
+        """ Records an event that happened during the span. """
+        pass
+
+    def record_exception(self, exception):
+        """ Records an exception that was raised during the span. """
+        pass
+
+_NOOP_SPAN = Span()
+
+
+class Tracer(object):
+    """
+    A tracer that records nothing.  Subclass this to adapt another
+    tracing system.
+    """
+
+    def span(self, name, attributes=None):
+        """
+        Returns a context manager for a span named `name` with the
+        dictionary `attributes`.  The span must be a child of the span
+        that is current when it is entered, and must record any exception
+        raised inside of it.
+        """
+        return _NOOP_SPAN
+
+
+class OpenTelemetryTracer(Tracer):
+    """
+    Reports spans through the OpenTelemetry API.
+
+    `tracer` may be any object with a ``start_as_current_span(name,
+    attributes=None)`` method, such as an OpenTelemetry tracer.  If it
+    is not given, ``opentelemetry.trace.get_tracer('pycassa')`` is used,
+    which requires the ``opentelemetry-api`` package.
+
+    Usage::
+
+        >>> pool = ConnectionPool(..., tracer=OpenTelemetryTracer())
+
+    """
+
+    def __init__(self, tracer=None):
+        if tracer is None:
+            from opentelemetry import trace
+            tracer = trace.get_tracer('pycassa')
+        self.tracer = tracer
+
+    def span(self, name, attributes=None):
+        return self.tracer.start_as_current_span(name, attributes=attributes)
+
+
+def _cf_span(cf, operation, page=None):
+    """
+    Returns a span for `operation` on the column family `cf`, or a span
+    that records nothing when its pool has no tracer.
+    """
+    tracer = getattr(cf.pool, 'tracer', None)
+    if tracer is None:
+        return _NOOP_SPAN
+    attributes = {'db.system': 'cassandra',
+                  'db.name': cf.pool.keyspace,
+                  'db.cassandra.table': cf.column_family,
+                  'db.operation': operation}
+    if page is not None:
+        attributes['pycassa.page'] = page
+    return tracer.span('ColumnFamily.' + operation, attributes)
+
+
+def _traced(f):
+    """
+    Wraps a :class:`~pycassa.columnfamily.ColumnFamily` method in a span
+    when its pool has a tracer.
+    """
+    operation = f.__name__
+
+    @functools.wraps(f)
+    def wrapper(self, *args, **kwargs):
+        if getattr(self.pool, 'tracer', None) is None:
+            return f(self, *args, **kwargs)
+        with _cf_span(self, operation):
+            return f(self, *args, **kwargs)
+
+    return wrapper
@@ -251,11 +251,21 @@ class CompositeType(CassandraType):
 
     @property
     def pack(self):
-        return marshal.get_composite_packer(composite_type=self)
+        # Building the packer is relatively expensive, so it is
+        # only done once per instance
+        try:
+            return self._packer
+        except AttributeError:
+            self._packer = marshal.get_composite_packer(composite_type=self)
+            return self._packer
 
     @property
     def unpack(self):
-        return marshal.get_composite_unpacker(composite_type=self)
+        try:
+            return self._unpacker
+        except AttributeError:
+            self._unpacker = marshal.get_composite_unpacker(composite_type=self)
+            return self._unpacker
 
 class DynamicCompositeType(CassandraType):
     """
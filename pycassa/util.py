@@ -4,11 +4,16 @@ available for use by others working with pycassa.
 
 """
 
+import os
 import random
+import struct
+import threading
+import time
 import uuid
 import calendar
 
-__all__ = ['convert_time_to_uuid', 'convert_uuid_to_time', 'OrderedDict']
+__all__ = ['convert_time_to_uuid', 'convert_uuid_to_time', 'TimeUUIDGenerator',
+           'OrderedDict']
 
 _number_types = frozenset((int, long, float))
 
@@ -18,6 +23,22 @@ LOWEST_TIME_UUID = uuid.UUID('00000000-0000-1000-8080-808080808080')
 HIGHEST_TIME_UUID = uuid.UUID('ffffffff-ffff-1fff-bf7f-7f7f7f7f7f7f')
 """ The highest possible TimeUUID, as sorted by Cassandra. """
 
+# 0x01b21dd213814000 is the number of 100-ns intervals between the
+# UUID epoch 1582-10-15 00:00:00 and the Unix epoch 1970-01-01 00:00:00.
+_UUID_EPOCH_OFFSET = 0x01b21dd213814000L
+
+def _uuid_timestamp(time_arg):
+    """ Converts a datetime or timestamp to a 60 bit v1 UUID timestamp """
+    if hasattr(time_arg, 'utctimetuple'):
+        seconds = int(calendar.timegm(time_arg.utctimetuple()))
+        microseconds = (seconds * 1e6) + time_arg.time().microsecond
+    elif type(time_arg) in _number_types:
+        microseconds = int(time_arg * 1e6)
+    else:
+        raise ValueError('Argument for a v1 UUID column name or value was ' +
+                'neither a UUID, a datetime, or a number')
+    return int(microseconds * 10) + _UUID_EPOCH_OFFSET
+
 def convert_time_to_uuid(time_arg, lowest_val=True, randomize=False):
     """
     Converts a datetime or timestamp to a type 1 :class:`uuid.UUID`.
@@ -65,18 +86,7 @@ def convert_time_to_uuid(time_arg, lowest_val=True, randomize=False):
     if isinstance(time_arg, uuid.UUID):
         return time_arg
 
-    if hasattr(time_arg, 'utctimetuple'):
-        seconds = int(calendar.timegm(time_arg.utctimetuple()))
-        microseconds = (seconds * 1e6) + time_arg.time().microsecond
-    elif type(time_arg) in _number_types:
-        microseconds = int(time_arg * 1e6)
-    else:
-        raise ValueError('Argument for a v1 UUID column name or value was ' +
-                'neither a UUID, a datetime, or a number')
-
-    # 0x01b21dd213814000 is the number of 100-ns intervals between the
-    # UUID epoch 1582-10-15 00:00:00 and the Unix epoch 1970-01-01 00:00:00.
-    timestamp = int(microseconds * 10) + 0x01b21dd213814000L
+    timestamp = _uuid_timestamp(time_arg)
 
     time_low = timestamp & 0xffffffffL
     time_mid = (timestamp >> 32L) & 0xffffL
@@ -130,7 +140,118 @@ def convert_uuid_to_time(uuid_arg):
 
     """
     ts = uuid_arg.get_time()
-    return (ts - 0x01b21dd213814000L)/1e7
+    return (ts - _UUID_EPOCH_OFFSET)/1e7
+
+class TimeUUIDGenerator(object):
+    """
+    Generates version 1 UUIDs as raw 16 byte strings, which is the
+    form that they are stored in with ``TimeUUIDType``, without
+    building :class:`uuid.UUID` objects.
+
+    The node portion of the UUIDs is random per process and the clock
+    sequence is a counter, so UUIDs from the same generator will not
+    collide.  When no time is given, the current time is used and each
+    UUID sorts strictly after the previous one, as compared by Cassandra.
+
+    Instances are thread-safe.  A module-level instance is used when
+    packing ``TimeUUIDType`` values from datetimes and timestamps.
+    """
+
+    # time_low, time_mid, time_hi_version, clock_seq_hi_variant, clock_seq_low
+    _header_packer = struct.Struct('>IHHBB')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_timestamp = 0
+        self._seq = 0
+        self._counter = 0
+        self._reset_node()
+
+    def _reset_node(self):
+        self._pid = os.getpid()
+        # Set the multicast bit, as RFC 4122 requires for random nodes
+        node = random.getrandbits(48) | 0x010000000000L
+        self._node = struct.pack('>HI', node >> 32, node & 0xffffffffL)
+
+    def _pack(self, timestamp, seq):
+        # Cassandra compares the clock sequence bytes as signed bytes.
+        # The variant bits keep the high byte negative, and flipping the
+        # top bit of the low byte keeps byte order the same as seq order.
+        return self._header_packer.pack(
+                timestamp & 0xffffffffL,
+                (timestamp >> 32) & 0xffffL,
+                ((timestamp >> 48) & 0x0fffL) | 0x1000,
+                0x80 | (seq >> 8),
+                (seq & 0xff) ^ 0x80) + self._node
+
+    def _next_now(self):
+        # must be called while holding the lock
+        timestamp = int(time.time() * 1e7) + _UUID_EPOCH_OFFSET
+        if timestamp > self._last_timestamp:
+            self._last_timestamp = timestamp
+            self._seq = 0
+        else:
+            self._seq += 1
+            if self._seq > 0x3fff:
+                self._seq = 0
+                self._last_timestamp += 1
+        return self._pack(self._last_timestamp, self._seq)
+
+    def _next_at(self, timestamp):
+        # must be called while holding the lock
+        self._counter = (self._counter + 1) % (0x4000 * 10)
+        # spread the counter over the clock sequence and the
+        # sub-microsecond part of the timestamp
+        return self._pack(timestamp + (self._counter >> 14),
+                          self._counter & 0x3fff)
+
+    def next_bytes(self, time_arg=None):
+        """
+        Returns a new v1 UUID as a 16 byte string.
+
+        `time_arg` may be a :class:`datetime` or a timestamp, as with
+        :func:`convert_time_to_uuid()`.  If it is ``None``, the current
+        time is used.
+        """
+        if time_arg is not None:
+            timestamp = _uuid_timestamp(time_arg)
+        self._lock.acquire()
+        try:
+            if self._pid != os.getpid():
+                self._reset_node()
+            if time_arg is None:
+                return self._next_now()
+            else:
+                return self._next_at(timestamp)
+        finally:
+            self._lock.release()
+
+    def bulk_bytes(self, count, time_arg=None):
+        """
+        Like :meth:`next_bytes()`, but returns a list of `count` UUIDs.
+        """
+        if time_arg is not None:
+            timestamp = _uuid_timestamp(time_arg)
+        self._lock.acquire()
+        try:
+            if self._pid != os.getpid():
+                self._reset_node()
+            if time_arg is None:
+                next_now = self._next_now
+                return [next_now() for i in xrange(count)]
+            else:
+                next_at = self._next_at
+                return [next_at(timestamp) for i in xrange(count)]
+        finally:
+            self._lock.release()
+
+    def next_uuid(self, time_arg=None):
+        """
+        Like :meth:`next_bytes()`, but returns a :class:`uuid.UUID`.
+        """
+        return uuid.UUID(bytes=self.next_bytes(time_arg))
+
+_time_uuid_generator = TimeUUIDGenerator()
 
 # Copyright (C) 2005, 2006, 2007, 2008, 2009, 2010 Michael Bayer mike_mp@zzzcomputing.com
 #
@@ -1,7 +1,7 @@
 from pycassa import NotFoundException
 from pycassa.pool import ConnectionPool
 from pycassa.columnfamily import ColumnFamily
-from pycassa.util import OrderedDict, convert_uuid_to_time
+from pycassa.util import OrderedDict, convert_uuid_to_time, TimeUUIDGenerator
 from pycassa.system_manager import SystemManager
 from pycassa.types import (LongType, IntegerType, TimeUUIDType, LexicalUUIDType,
                            AsciiType, UTF8Type, BytesType, CompositeType,
@@ -1133,6 +1133,39 @@ class TestTimeUUIDs(unittest.TestCase):
         assert_almost_equal(timestamp, t, places=3)
         cf_time.remove(key)
 
+class TestTimeUUIDGenerator(unittest.TestCase):
+
+    def _cassandra_order(self, packed):
+        # TimeUUIDType sorts by timestamp and then by the signed bytes
+        u = uuid.UUID(bytes=packed)
+        return (u.time, [(ord(c) + 128) % 256 for c in packed[8:]])
+
+    def test_strictly_increasing(self):
+        generator = TimeUUIDGenerator()
+        before = time.time()
+        packed = generator.bulk_bytes(20000) + [generator.next_bytes()]
+        uuids = (uuid.UUID(bytes=packed[0]), generator.next_uuid())
+        after = time.time()
+
+        assert_equal(len(set(packed)), len(packed))
+        assert_equal(sorted(packed, key=self._cassandra_order), packed)
+        for u in uuids:
+            assert_equal(u.version, 1)
+            assert_true(before - 0.01 <= convert_uuid_to_time(u) <= after + 0.01)
+
+    def test_given_time(self):
+        generator = TimeUUIDGenerator()
+        t = time.time()
+        packed = generator.bulk_bytes(20000, t)
+        assert_equal(len(set(packed)), len(packed))
+        for p in packed:
+            assert_almost_equal(convert_uuid_to_time(uuid.UUID(bytes=p)), t, places=5)
+
+        packer = marshal.packer_for('TimeUUIDType')
+        assert_almost_equal(convert_uuid_to_time(uuid.UUID(bytes=packer(t))), t, places=5)
+        assert_equal(packer(TIME1), TIME1.bytes)
+        assert_raises(ValueError, packer, None)
+
 class TestTypeErrors(unittest.TestCase):
 
     def test_packing_enabled(self):
@@ -1370,3 +1403,87 @@ class TestCustomComposite(unittest.TestCase):
         check(((dt2, False),),  (dt1,),         True)
         check((dt1,),          ((dt0, False),), True)
 
+
+class TestCompositeMarshal(unittest.TestCase):
+    """
+    Check the composite packers against the encoded format directly.
+    """
+
+    def _expected(self, parts, eocs):
+        return ''.join(marshal._short_packer.pack(len(p)) + p + eoc
+                       for p, eoc in zip(parts, eocs))
+
+    def test_fixed_width_components(self):
+        comp = CompositeType(LongType(), DoubleType(), DateType(),
+                             BooleanType(), TimeUUIDType())
+        dt = datetime(2012, 3, 5, 10, 30)
+        value = (-5, 1.5, dt, True, TIME1)
+        parts = [marshal._long_packer.pack(-5), marshal._double_packer.pack(1.5),
+                 marshal._long_packer.pack(marshal._to_timestamp(dt)),
+                 '\x01', TIME1.bytes]
+
+        packed = comp.pack(value)
+        assert_equal(packed, self._expected(parts, ['\x00'] * 5))
+        assert_equal(comp.unpack(packed), value)
+        assert_equal(comp.pack(value, slice_start=True),
+                     self._expected(parts, ['\x00'] * 4 + ['\xff']))
+        assert_equal(comp.pack(value, slice_start=False),
+                     self._expected(parts, ['\x00'] * 4 + ['\x01']))
+
+        # partial composites and inclusive flags use the general path
+        packed = comp.pack((-5, (1.5, False)), slice_start=True)
+        assert_equal(packed, self._expected(parts[:2], ['\x00', '\x01']))
+        assert_equal(comp.unpack(packed), (-5, 1.5))
+
+    def test_mixed_components(self):
+        typestr = 'CompositeType(LongType, UTF8Type, ReversedType(Int32Type))'
+        packer = marshal.packer_for(typestr)
+        unpacker = marshal.unpacker_for(typestr)
+        value = (1L, u'\xe9t\xe9', -7)
+        packed = packer(value)
+        assert_equal(packed, self._expected(
+            [marshal._long_packer.pack(1), u'\xe9t\xe9'.encode('utf-8'),
+             marshal._int_packer.pack(-7)], ['\x00'] * 3))
+        assert_equal(unpacker(packed), value)
+
+    def test_dynamic_composite(self):
+        typestr = 'DynamicCompositeType(a=>AsciiType,l=>LongType)'
+        packer = marshal.packer_for(typestr)
+        value = (('a', 'foo'), ('l', 5), ('UTF8Type', u'x'))
+        packed = packer(value)
+        assert_equal(packed, '\x80a\x00\x03foo\x00' +
+                             '\x80l\x00\x08' + marshal._long_packer.pack(5) + '\x00' +
+                             '\x00\x08UTF8Type\x00\x01x\x00')
+        assert_equal(marshal.unpacker_for(typestr)(packed), value)
+
+    def test_cached_packers(self):
+        typestr = 'CompositeType(LongType, AsciiType)'
+        assert_true(marshal.packer_for(typestr) is marshal.packer_for(typestr))
+        assert_true(marshal.packer_for(typestr) is
+                    marshal.packer_for('CompositeType(LongType,AsciiType)'))
+        assert_true(marshal.unpacker_for(typestr) is marshal.unpacker_for(typestr))
+        assert_equal(marshal.extract_type_name(typestr),
+                     'CompositeType(LongType, AsciiType)')
+
+class TestBulkPackers(unittest.TestCase):
+
+    def test_bulk_matches_single(self):
+        dt = datetime(2012, 3, 5, 10, 30)
+        cases = [(LongType, [0, -1, 2 ** 40]),
+                 (Int32Type, [0, -1, 2 ** 20]),
+                 (DoubleType, [0.5, -1.25]),
+                 (BooleanType, [True, False, 1]),
+                 (DateType, [dt, 0, 1.5]),
+                 (UTF8Type, [u'\xe9t\xe9', 'abc']),
+                 (TimeUUIDType, [TIME1, TIME2])]
+        for type_class, values in cases:
+            typestr = type_class.__name__
+            packer = marshal.packer_for(typestr)
+            expected = [packer(v) for v in values]
+            assert_equal(marshal.bulk_packer_for(typestr)(values), expected)
+
+            bulk_packer = marshal.bulk_packer_for(cassandra_type=type_class())
+            assert_equal(bulk_packer(values), expected)
+
+        bulk_packer = marshal.bulk_packer_for(cassandra_type=OldPycassaDateType())
+        assert_equal(bulk_packer([dt]), [OldPycassaDateType.pack(dt)])
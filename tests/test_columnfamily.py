@@ -1,10 +1,13 @@
 import unittest
 
+from nose import SkipTest
 from nose.tools import assert_raises, assert_equal, assert_true
 
 from pycassa import index, ColumnFamily, ConnectionPool,\
                     NotFoundException, SystemManager
+from pycassa.columnfamily import LazyRow
 from pycassa.util import OrderedDict
+from pycassa.types import LongType, DoubleType
 
 from tests.util import requireOPP
 
@@ -148,6 +151,29 @@ class TestColumnFamily(unittest.TestCase):
             assert_equal(c, columns)
 
     @requireOPP
+    def test_lazy_rows(self):
+        key1 = 'TestColumnFamily.test_lazy_rows1'
+        key2 = 'TestColumnFamily.test_lazy_rows2'
+        columns = {'1': 'val1', '2': 'val2'}
+        cf.insert(key1, columns)
+        cf.insert(key2, columns)
+
+        rows = cf.multiget([key1, key2, 'missing'], lazy=True)
+        assert_equal(rows.keys(), [key1, key2])
+        row = rows[key1]
+        assert_true(isinstance(row, LazyRow))
+        assert_equal(row['2'], 'val2')
+        assert_true('1' in row)
+        assert_true('3' not in row)
+        assert_raises(KeyError, row.__getitem__, '3')
+        assert_equal(row.keys(), ['1', '2'])
+        assert_equal(row, columns)
+
+        for key, row in cf.get_range(start=key1, finish=key1, lazy=True,
+                                     include_timestamp=True):
+            assert_equal(row['1'][0], 'val1')
+            assert_equal(len(row), 2)
+
     def test_get_range_batching(self):
         cf.truncate()
 
@@ -337,6 +363,22 @@ class TestColumnFamily(unittest.TestCase):
         assert_equal(cf.multiget(keys, buffer_size=11), expected)
         assert_equal(cf.multiget(keys, buffer_size=100), expected)
 
+    def test_xmultiget(self):
+        key_prefix = "TestColumnFamily.test_xmultiget"
+        keys = []
+        expected = []
+        for i in range(10):
+            key = key_prefix + str(i)
+            keys.append(key)
+            expected.append((key, {'col': 'val'}))
+            cf.insert(key, {'col': 'val'})
+
+        keys.append(key_prefix + 'missing')
+        assert_equal(list(cf.xmultiget(keys, buffer_size=3)), expected)
+        for bufsz in (1, 3, 100):
+            rows = list(cf.xmultiget(keys, buffer_size=bufsz, concurrency=4))
+            assert_equal(sorted(rows), expected)
+
     def test_add(self):
         counter_cf.add('key', 'col')
         result = counter_cf.get('key')
@@ -433,6 +475,35 @@ class TestColumnFamily(unittest.TestCase):
         res = list(counter_cf.xget(key))
         assert_equal(res, [('col1', 2), ('col2', 1)])
 
+    def test_xget_columnar(self):
+        try:
+            import numpy
+        except ImportError:
+            raise SkipTest('numpy is not installed')
+
+        long_cf = ColumnFamily(pool, 'Standard1')
+        long_cf.column_name_class = LongType()
+        long_cf.default_validation_class = DoubleType()
+
+        key = 'test_xget_columnar'
+        long_cf.insert(key, dict((i, i * 0.5) for i in range(100)), timestamp=42)
+
+        pages = list(long_cf.xget_columnar(key, buffer_size=30))
+        assert_equal(len(pages), 4)
+        names = numpy.concatenate([p[0] for p in pages])
+        values = numpy.concatenate([p[1] for p in pages])
+        timestamps = numpy.concatenate([p[2] for p in pages])
+        assert_equal(names.dtype, numpy.int64)
+        assert_equal(names.tolist(), range(100))
+        assert_equal(values.tolist(), [i * 0.5 for i in range(100)])
+        assert_equal(set(timestamps.tolist()), set([42]))
+
+        pages = list(long_cf.xget_columnar(key, column_start=10, column_count=5))
+        assert_equal(pages[0][0].tolist(), range(10, 15))
+
+        rows = dict(long_cf.get_range_columnar(start=key, finish=key))
+        assert_equal(rows[key][1].tolist(), [i * 0.5 for i in range(100)])
+
 class TestSuperColumnFamily(unittest.TestCase):
 
     def tearDown(self):
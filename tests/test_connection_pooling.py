@@ -4,8 +4,11 @@ import time
 
 from nose.tools import assert_raises, assert_equal, assert_true
 from pycassa import ColumnFamily, ConnectionPool, InvalidRequestError,\
-                    NoConnectionAvailable, MaximumRetryException, AllServersUnavailable
+                    NoConnectionAvailable, MaximumRetryException, AllServersUnavailable,\
+                    DeadlineExceeded
 from pycassa.logging.pool_stats_logger import StatsLogger
+from pycassa.logging.traffic_stats_logger import TrafficStatsLogger
+from pycassa.tracing import Span, Tracer
 from pycassa.cassandra.ttypes import ColumnPath
 from pycassa.cassandra.ttypes import InvalidRequestException
 from pycassa.cassandra.ttypes import NotFoundException
@@ -166,6 +169,35 @@ class PoolingCase(unittest.TestCase):
 
         pool.dispose()
 
+    def test_queue_pool_contention(self):
+        stats_logger = StatsLoggerWithListStorage()
+        pool = ConnectionPool(pool_size=2, max_overflow=1, pool_timeout=-1,
+                         keyspace='PycassaTestKeyspace', credentials=_credentials,
+                         listeners=[stats_logger], use_threadlocal=False)
+        errors = []
+
+        def checkout_return():
+            try:
+                for i in range(50):
+                    conn = pool.get()
+                    assert_true(pool._current_conns <= 3)
+                    conn.return_to_pool()
+            except Exception, exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=checkout_return) for i in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert_equal(errors, [])
+        assert_equal(stats_logger.stats['checked_out'], 500)
+        assert_equal(stats_logger.stats['checked_in'], 500)
+        assert_equal(pool.checkedout(), 0)
+        assert_true(pool.checkedin() <= 2)
+        pool.dispose()
+
     def test_queue_pool_no_prefill(self):
         stats_logger = StatsLoggerWithListStorage()
         pool = ConnectionPool(pool_size=5, max_overflow=5, recycle=10000,
@@ -398,6 +430,168 @@ class PoolingCase(unittest.TestCase):
 
             pool.dispose()
 
+    def test_retry_budget(self):
+        stats_logger = StatsLoggerWithListStorage()
+        pool = ConnectionPool(pool_size=5, max_overflow=5, recycle=10000,
+                         prefill=True, max_retries=10, retry_budget=0,
+                         keyspace='PycassaTestKeyspace', credentials=_credentials,
+                         listeners=[stats_logger], use_threadlocal=False,
+                         server_list=['localhost:9160', 'localhost:9160'])
+        pool._retry_tokens = 2
+
+        # Corrupt all of the connections
+        for i in range(5):
+            conn = pool.get()
+            setattr(conn, 'send_batch_mutate', conn._fail_once)
+            conn._should_fail = True
+            conn.return_to_pool()
+
+        cf = ColumnFamily(pool, 'Standard1')
+        assert_raises(MaximumRetryException, cf.insert, 'key', {'col': 'val', 'col2': 'val'})
+        assert_equal(stats_logger.stats['failed'], 3) # The budget allowed 2 retries
+        assert_equal(stats_logger.stats['retried'], {'allowed': 2, 'denied': 1})
+
+        pool.dispose()
+
+    def test_traffic_after_retry(self):
+        traffic = TrafficStatsLogger()
+        pool = ConnectionPool(pool_size=1, max_overflow=0, prefill=True, max_retries=3,
+                              keyspace='PycassaTestKeyspace', credentials=_credentials,
+                              listeners=[traffic], use_threadlocal=False)
+
+        # Fail the first attempt so that it is retried on a new connection
+        conn = pool.get()
+        setattr(conn, 'send_batch_mutate', conn._fail_once)
+        conn._should_fail = True
+        conn.return_to_pool()
+
+        cf = ColumnFamily(pool, 'Standard1')
+        cf.insert('key', {'col': 'val'})
+        stats = traffic.stats
+        # Both attempts are attributed to the column family
+        assert_equal(stats['Standard1']['batch_mutate']['calls'], 2)
+        assert_true('batch_mutate' not in stats.get(None, {}))
+        cf.remove('key')
+        pool.dispose()
+
+    def test_tracing(self):
+        tracer = RecordingTracer()
+        pool = ConnectionPool(pool_size=1, max_overflow=0, pool_timeout=0.01,
+                         prefill=True, max_retries=3, tracer=tracer,
+                         keyspace='PycassaTestKeyspace', credentials=_credentials,
+                         use_threadlocal=False)
+
+        # Fail the first attempt so that it is retried
+        conn = pool.get()
+        setattr(conn, 'send_batch_mutate', conn._fail_once)
+        conn._should_fail = True
+        conn.return_to_pool()
+
+        cf = ColumnFamily(pool, 'Standard1')
+        del tracer.spans[:]
+        cf.insert('key', {'col': 'val'})
+        assert_equal([(depth, name) for depth, name, attrs in tracer.spans],
+                     [(1, 'thrift.batch_mutate'), (1, 'pycassa.backoff'),
+                      (1, 'thrift.batch_mutate'), (0, 'ColumnFamily.insert')])
+        assert_equal(tracer.spans[-1][2]['db.cassandra.table'], 'Standard1')
+        assert_equal(tracer.spans[2][2]['pycassa.attempt'], 1)
+
+        # The retried connection still describes the request it made
+        conn = pool.get()
+        assert_equal(conn.info['request']['method'], 'batch_mutate')
+        conn.return_to_pool()
+
+        # Paging reads get a span for each page
+        del tracer.spans[:]
+        list(cf.get_range())
+        assert_equal([(depth, name) for depth, name, attrs in tracer.spans],
+                     [(1, 'thrift.get_range_slices'), (0, 'ColumnFamily.get_range')])
+        assert_equal(tracer.spans[-1][2]['pycassa.page'], 0)
+
+        # Time spent waiting on an exhausted pool gets its own span
+        conn = pool.get()
+        del tracer.spans[:]
+        assert_raises(NoConnectionAvailable, pool.get)
+        assert_equal(tracer.spans[0][1], 'pycassa.pool_wait')
+        assert_equal(tracer.spans[0][2]['pycassa.obtained'], False)
+        conn.return_to_pool()
+
+        pool.dispose()
+
+    def test_wait_threshold(self):
+        stats_logger = StatsLoggerWithListStorage()
+        pool = ConnectionPool(pool_size=1, max_overflow=0, pool_timeout=0.5,
+                         prefill=True, wait_threshold=0.05,
+                         keyspace='PycassaTestKeyspace', credentials=_credentials,
+                         listeners=[stats_logger], use_threadlocal=False)
+        assert_equal(pool.wait_stats()['count'], 0)
+
+        conn = pool.get()
+        timer = threading.Timer(0.2, conn.return_to_pool)
+        timer.start()
+        assert_true(pool.get() is conn)
+        timer.join()
+
+        # The event fires while the checkout is still blocked
+        assert_equal(stats_logger.stats['wait_exceeded'], 1)
+        stats = pool.wait_stats(reset=True)
+        assert_equal(stats['count'], 1)
+        assert_true(stats['min'] >= 0.15)
+        assert_equal(pool.wait_stats()['count'], 0)
+        assert_equal(pool.waiters(), 0)
+
+        conn.return_to_pool()
+        pool.dispose()
+
+    def test_adaptive_size(self):
+        stats_logger = StatsLoggerWithListStorage()
+        pool = ConnectionPool(pool_size=2, max_overflow=2, pool_timeout=1,
+                         prefill=False, min_pool_size=1, max_pool_size=4,
+                         resize_interval=1000,
+                         keyspace='PycassaTestKeyspace', credentials=_credentials,
+                         listeners=[stats_logger], use_threadlocal=False)
+
+        # Absorb the overflow connections that were needed
+        conns = [pool.get() for i in range(4)]
+        assert_equal(pool.overflow(), 2)
+        for conn in conns:
+            conn.return_to_pool()
+        assert_equal(pool.checkedin(), 2)
+        pool._adapt_size()
+        assert_equal(pool.size(), 4)
+        assert_equal(stats_logger.stats['resized'], 1)
+
+        # Shed half of the connections that stayed idle each interval
+        sizes = []
+        for i in range(3):
+            pool._adapt_size()
+            sizes.append(pool.size())
+        assert_equal(sizes, [3, 2, 1])
+        assert_equal(pool.checkedin(), 1)
+        assert_equal(stats_logger.stats['resized'], 4)
+
+        pool.dispose()
+
+        # Without max_pool_size, the pool may grow back to its initial size
+        pool = ConnectionPool(pool_size=2, max_overflow=2, pool_timeout=1,
+                         prefill=False, min_pool_size=1, resize_interval=1000,
+                         keyspace='PycassaTestKeyspace', credentials=_credentials,
+                         use_threadlocal=False)
+        for conn in [pool.get() for i in range(2)]:
+            conn.return_to_pool()
+        pool._adapt_size()
+        pool._adapt_size()
+        assert_equal(pool.size(), 1)
+
+        for i in range(2):
+            conns = [pool.get() for i in range(3)]
+            for conn in conns:
+                conn.return_to_pool()
+            pool._adapt_size()
+            assert_equal(pool.size(), 2)
+
+        pool.dispose()
+
     def test_queue_failure_on_retry(self):
         stats_logger = StatsLoggerWithListStorage()
         pool = ConnectionPool(pool_size=5, max_overflow=5, recycle=10000,
@@ -503,6 +697,206 @@ class PoolingCase(unittest.TestCase):
         assert_raises(NotFoundException, cf.get, 'none')
         pool.dispose()
 
+    def test_parallel_fill(self):
+        stats_logger = StatsLoggerWithListStorage()
+        pool = ConnectionPool('PycassaTestKeyspace', credentials=_credentials,
+                              pool_size=6, fill_concurrency=3,
+                              listeners=[stats_logger], use_threadlocal=False)
+        assert_equal(pool.checkedin(), 6)
+        assert_equal(stats_logger.stats['created']['success'], 6)
+        pool.dispose()
+
+        pool = ConnectionPool('PycassaTestKeyspace', credentials=_credentials,
+                              pool_size=4, background_fill=True)
+        cf = ColumnFamily(pool, 'Standard1')
+        cf.insert('key1', {'col': 'val'})
+        for i in range(50):
+            if pool.checkedin() == 4:
+                break
+            time.sleep(0.1)
+        assert_equal(pool.checkedin(), 4)
+        assert_equal(pool.checkedout(), 0)
+        pool.dispose()
+
+    def test_idle_and_max_lifetime(self):
+        pool = ConnectionPool('PycassaTestKeyspace', credentials=_credentials,
+                              pool_size=2, max_idle_time=0.2, use_threadlocal=False)
+        time.sleep(0.6)
+        assert_equal(pool.checkedin(), 0)
+        cf = ColumnFamily(pool, 'Standard1')
+        cf.insert('key1', {'col': 'val'})
+        pool.dispose()
+
+        pool = ConnectionPool('PycassaTestKeyspace', credentials=_credentials,
+                              pool_size=2, max_lifetime=0.3, keepalive_interval=0.1,
+                              use_threadlocal=False)
+        original = list(pool._idle)
+        time.sleep(0.8)
+        assert_equal(pool.checkedin(), 2)
+        for conn in pool._idle:
+            assert_true(conn not in original)
+        pool.dispose()
+
+        # Setting an option after the pool is created starts maintenance
+        pool = ConnectionPool('PycassaTestKeyspace', credentials=_credentials,
+                              pool_size=2, use_threadlocal=False)
+        assert_equal(pool.checkedin(), 2)
+        pool.max_idle_time = 0.2
+        time.sleep(0.6)
+        assert_equal(pool.checkedin(), 0)
+        pool.dispose()
+
+    def test_discover_servers(self):
+        pool = ConnectionPool('PycassaTestKeyspace', credentials=_credentials,
+                              pool_size=2, use_threadlocal=False)
+        servers = pool.discover_servers()
+        assert_true(len(servers) > 0)
+        assert_equal(sorted(pool.server_list), sorted(servers))
+        for server in servers:
+            assert_true(server.endswith(':9160'))
+
+        # Connections to servers that were replaced have been drained
+        cf = ColumnFamily(pool, 'Standard1')
+        cf.insert('key1', {'col': 'val'})
+        for conn in pool._idle:
+            assert_true(conn.server in servers)
+        pool.dispose()
+
+    def test_local_dc(self):
+        pool = ConnectionPool('PycassaTestKeyspace', credentials=_credentials,
+                              pool_size=2, local_dc='nonexistent_dc')
+        dcs = set(pool._server_dcs.values())
+        assert_true(len(dcs) > 0)
+        assert_true('nonexistent_dc' not in dcs)
+        # With no local servers, remote ones are used
+        assert_equal(sum(pool.connections_per_datacenter().values()), 2)
+        pool.dispose()
+
+        local_dc = dcs.pop()
+        pool = ConnectionPool('PycassaTestKeyspace', credentials=_credentials,
+                              pool_size=2, local_dc=local_dc)
+        assert_equal(pool.connections_per_datacenter().get(local_dc), 2)
+        cf = ColumnFamily(pool, 'Standard1')
+        cf.insert('key1', {'col': 'val'})
+        for conn in pool._idle:
+            assert_equal(pool._server_dcs[conn.server], local_dc)
+        pool.dispose()
+
+    def test_speculative_reads(self):
+        pool = ConnectionPool('PycassaTestKeyspace', credentials=_credentials,
+                              pool_size=2, speculative_reads=True,
+                              speculative_delay=0, speculative_max_ratio=1.0)
+        cf = ColumnFamily(pool, 'Standard1')
+        cf.insert('key1', {'col': 'val'})
+        for i in range(5):
+            assert_equal(cf.get('key1'), {'col': 'val'})
+        assert_raises(NotFoundException, cf.get, 'nonexistent')
+
+        stats = pool.speculative_stats()
+        assert_equal(stats['reads'], 6)
+        assert_true(stats['hedges_won'] <= stats['hedges_issued'] <= 6)
+        # Every connection made it back to the pool
+        assert_equal(pool.checkedout(), 0)
+        cf.remove('key1')
+        pool.dispose()
+
+        # The first attempt uses the calling thread's connection
+        pool = ConnectionPool('PycassaTestKeyspace', credentials=_credentials,
+                              pool_size=2, use_threadlocal=True, speculative_reads=True,
+                              speculative_delay=10, speculative_max_ratio=1.0)
+        cf = ColumnFamily(pool, 'Standard1')
+        conn = pool.get()
+        assert_raises(NotFoundException, cf.get, 'nonexistent')
+        assert_true(pool.get() is conn)
+        assert_equal(pool.speculative_stats()['hedges_issued'], 0)
+        conn.return_to_pool()
+        pool.dispose()
+
+    def test_timeouts(self):
+        pool = ConnectionPool('PycassaTestKeyspace', credentials=_credentials,
+                              pool_size=1, max_retries=-1, timeout=0.5)
+        cf = ColumnFamily(pool, 'Standard1')
+        cf.insert('key1', {'col': 'val'}, timeout=5)
+        assert_equal(cf.get('key1', timeout=5), {'col': 'val'})
+        assert_raises(DeadlineExceeded, cf.get, 'key1', timeout=0)
+        assert_raises(DeadlineExceeded, cf.batch().insert('key2', {'col': 'val'}).send,
+                      timeout=0)
+
+        # The socket timeout is restored after each operation
+        conn = pool.get()
+        assert_equal(conn._tsocket._timeout, 0.5)
+        conn.return_to_pool()
+        cf.remove('key1')
+        pool.dispose()
+
+        # Waiting for a connection counts against the deadline
+        pool = ConnectionPool('PycassaTestKeyspace', credentials=_credentials,
+                              pool_size=1, max_overflow=0, pool_timeout=10,
+                              use_threadlocal=False)
+        cf = ColumnFamily(pool, 'Standard1')
+        conn = pool.get()
+        start = time.time()
+        assert_raises(DeadlineExceeded, cf.get, 'key1', timeout=0.2)
+        assert_raises(DeadlineExceeded, cf.batch().insert('key2', {'col': 'val'}).send,
+                      timeout=0.2)
+        assert_true(time.time() - start < 5)
+        conn.return_to_pool()
+        pool.dispose()
+
+    def test_schema_cache(self):
+        pool = ConnectionPool('PycassaTestKeyspace', credentials=_credentials,
+                              pool_size=1)
+        cf1 = ColumnFamily(pool, 'Standard1')
+        cf2 = ColumnFamily(pool, 'Standard1')
+        assert_true(cf1._cfdef is cf2._cfdef)
+
+        pool.invalidate_schema_cache()
+        cf3 = ColumnFamily(pool, 'Standard1')
+        assert_true(cf3._cfdef is not cf1._cfdef)
+
+        # Once stale, the description is kept if the schema is unchanged
+        pool.schema_refresh_interval = 0
+        cf6 = ColumnFamily(pool, 'Standard1')
+        assert_true(cf6._cfdef is cf3._cfdef)
+
+        pool.schema_cache = False
+        cf4 = ColumnFamily(pool, 'Standard1')
+        cf5 = ColumnFamily(pool, 'Standard1')
+        assert_true(cf4._cfdef is not cf5._cfdef)
+        pool.dispose()
+
+
+class _RecordingSpan(Span):
+
+    def __init__(self, tracer, name, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = dict(attributes or {})
+
+    def __enter__(self):
+        self.depth = len(self.tracer.stack)
+        self.tracer.stack.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.tracer.stack.pop()
+        self.tracer.spans.append((self.depth, self.name, self.attributes))
+        return False
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+
+class RecordingTracer(Tracer):
+    """ Records ``(depth, name, attributes)`` as each span ends. """
+
+    def __init__(self):
+        self.stack = []
+        self.spans = []
+
+    def span(self, name, attributes=None):
+        return _RecordingSpan(self, name, attributes)
+
 
 class StatsLoggerWithListStorage(StatsLogger):
 
@@ -1,7 +1,15 @@
+import threading
 from unittest import TestCase
-from nose.tools import assert_equal, assert_raises
+from nose.tools import assert_equal, assert_raises, assert_true
 
+from pycassa.logging.latency_stats_logger import LatencyHistogram, LatencyStatsLogger
+from pycassa.logging.metrics_exporter import MetricsExporter, StatsdEmitter
+from pycassa.logging.pool_logger import PoolLogger
 from pycassa.logging.pool_stats_logger import StatsLogger
+from pycassa.logging.pycassa_logger import PycassaLogger
+from pycassa.logging.slow_query_logger import SlowQueryLogger, describe_request
+from pycassa.logging.traffic_stats_logger import TrafficStatsLogger
+from pycassa.cassandra.ttypes import ColumnParent, SlicePredicate, SliceRange
 from pycassa.pool import ConnectionPool, NoConnectionAvailable, InvalidRequestError
 
 __author__ = 'gilles'
@@ -64,6 +72,34 @@ class TestStatsLogger(TestCase):
         stats = self.logger.stats
         assert_equal(stats['at_max'], 1)
 
+    def test_pool_wait_exceeded(self):
+        self.logger.pool_wait_exceeded({'wait': 0.5})
+        stats = self.logger.stats
+        assert_equal(stats['wait_exceeded'], 1)
+
+    def test_threads(self):
+        def checkout_and_in():
+            for i in range(1000):
+                self.logger.connection_checked_out({})
+                self.logger.connection_checked_in({})
+
+        threads = [threading.Thread(target=checkout_and_in) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        stats = self.logger.stats
+        assert_equal(stats['checked_out'], 8000)
+        assert_equal(stats['checked_in'], 8000)
+        assert_equal(stats['opened']['current'], 0)
+
+        self.logger.reset()
+        self.logger.connection_checked_out({})
+        stats = self.logger.stats
+        assert_equal(stats['checked_out'], 1)
+        assert_equal(stats['opened'], {'current': 1, 'max': 1})
+
 
 class TestInPool(TestCase):
     def __init__(self, methodName='runTest'):
@@ -131,3 +167,181 @@ class TestInPool(TestCase):
         assert_equal(listener.stats['disposed']['success'], 10)
 
         pool.dispose()
+
+
+class TestListenerSubscriptions(TestCase):
+
+    def tearDown(self):
+        PycassaLogger().set_logger_level('info')
+
+    def test_pool_logger_level(self):
+        pool = ConnectionPool('PycassaTestKeyspace', prefill=False)
+        pool_logger = pool.listeners[0]
+        assert_true(isinstance(pool_logger, PoolLogger))
+
+        # Debug events are skipped entirely at the default level
+        assert_true(pool_logger not in pool._on_checkout)
+        assert_true(pool_logger in pool._on_failure)
+
+        PycassaLogger().set_logger_level('debug')
+        assert_true(pool_logger in pool._on_checkout)
+
+        PycassaLogger().set_logger_level('error')
+        assert_true(pool_logger not in pool._on_failure)
+        pool.dispose()
+
+    def test_remove_listener(self):
+        pool = ConnectionPool('PycassaTestKeyspace', prefill=False)
+        listener = StatsLogger()
+        pool.add_listener(listener)
+        assert_true(listener in pool._on_checkout)
+
+        pool.remove_listener(listener)
+        assert_true(listener not in pool.listeners)
+        assert_true(listener not in pool._on_checkout)
+        assert_raises(ValueError, pool.remove_listener, listener)
+        pool.dispose()
+
+
+class TestLatencyStatsLogger(TestCase):
+
+    def test_histogram_percentiles(self):
+        histogram = LatencyHistogram()
+        assert_equal(histogram.percentile(50), None)
+        for ms in range(1, 1001):
+            histogram.record(ms / 1000.0)
+        assert_equal(histogram.count, 1000)
+
+        # Buckets keep percentiles within a few percent of the true value
+        for percentile, expected in ((50, 0.5), (99, 0.99), (99.9, 0.999)):
+            value = histogram.percentile(percentile)
+            assert_true(abs(value - expected) <= expected * 0.035, (percentile, value))
+
+        summary = histogram.copy(reset=True).summary()
+        assert_equal(summary['count'], 1000)
+        assert_equal(summary['min'], 0.001)
+        assert_equal(summary['max'], 1.0)
+        assert_equal(histogram.count, 0)
+
+    def test_snapshot(self):
+        latencies = LatencyStatsLogger()
+        for i in range(10):
+            latencies.request_finished({'method': 'get_slice', 'server': 'a:9160',
+                                        'elapsed': 0.002, 'error': None})
+        latencies.request_finished({'method': 'batch_mutate', 'server': 'b:9160',
+                                    'elapsed': 0.010, 'error': Exception()})
+
+        snapshot = latencies.snapshot(reset=True)
+        assert_equal(snapshot['methods']['get_slice']['count'], 10)
+        assert_equal(snapshot['servers']['b:9160']['count'], 1)
+        assert_equal(snapshot['errors'], {'batch_mutate': 1})
+
+        snapshot = latencies.snapshot()
+        assert_equal(snapshot['methods']['get_slice']['count'], 0)
+        assert_equal(snapshot['errors'], {})
+
+
+class TestMetricsExporter(TestCase):
+
+    def test_prometheus_text(self):
+        latencies = LatencyStatsLogger()
+        pool = ConnectionPool('PycassaTestKeyspace', prefill=False,
+                              listeners=[StatsLogger(), latencies],
+                              logging_name='exported')
+        for i in range(4):
+            latencies.request_finished({'method': 'get_slice', 'server': 'a:9160',
+                                        'elapsed': 0.5, 'error': None})
+
+        text = MetricsExporter(pool).prometheus_text()
+        assert_true('# TYPE pycassa_pool_checked_out gauge\n' in text)
+        assert_true('pycassa_pool_checked_in{pool="exported"} 0\n' in text)
+        assert_true('pycassa_retries_total{outcome="denied",pool="exported"} 0\n' in text)
+        assert_true('pycassa_request_latency_seconds_count{method="get_slice",pool="exported"} 4\n'
+                    in text)
+        pool.dispose()
+
+    def test_statsd_counter_deltas(self):
+        latencies = LatencyStatsLogger()
+        pool = ConnectionPool('PycassaTestKeyspace', prefill=False,
+                              listeners=[latencies], logging_name='exported')
+        emitter = StatsdEmitter(MetricsExporter(pool))
+        event = {'method': 'insert', 'server': 'a:9160', 'elapsed': 0.5,
+                 'error': Exception()}
+
+        latencies.request_finished(event)
+        assert_true('pycassa_request_errors_total.method_insert.pool_exported:1|c'
+                    in emitter.lines())
+        assert_true('pycassa_pool_overflow.pool_exported:0|g' in emitter.lines())
+
+        latencies.request_finished(event)
+        latencies.request_finished(event)
+        assert_true('pycassa_request_errors_total.method_insert.pool_exported:2|c'
+                    in emitter.lines())
+        pool.dispose()
+
+
+class _TracedConnection(object):
+
+    def __init__(self, args):
+        self.info = {'request': {'method': 'get_slice', 'args': args, 'kwargs': {}}}
+        self._retry_count = 0
+        self.traced = 0
+
+    def trace_next_query(self):
+        self.traced += 1
+        return '\x00' * 16
+
+
+class TestSlowQueryLogger(TestCase):
+
+    def test_describe_request(self):
+        predicate = SlicePredicate(slice_range=SliceRange('a', 'z', False, 100))
+        details = describe_request('multiget_slice',
+                                   (['k1', 'k2'], ColumnParent('Standard1'), predicate, 1))
+        assert_equal(details['column_families'], ['Standard1'])
+        assert_equal(details['keys'], 2)
+        assert_equal(details['predicate'], "slice 'a'..'z', count 100")
+
+        mutation_map = {'k1': {'Standard1': [], 'Super1': []}, 'k2': {'Standard1': []}}
+        details = describe_request('batch_mutate', (mutation_map, 1))
+        assert_equal(details['column_families'], ['Standard1', 'Super1'])
+        assert_equal(details['keys'], 2)
+
+    def test_trace_every(self):
+        slow_queries = SlowQueryLogger(threshold=0.1, trace_every=2)
+        conn = _TracedConnection(('key', ColumnParent('Standard1'),
+                                  SlicePredicate(column_names=['a']), 1))
+        event = {'method': 'get_slice', 'server': 'a:9160', 'connection': conn,
+                 'elapsed': 0.2, 'error': None}
+
+        slow_queries.request_finished(dict(event, elapsed=0.01))
+        slow_queries.request_finished(event)
+        assert_equal(conn.traced, 0)
+        slow_queries.request_finished(event)
+        assert_equal(conn.traced, 1)
+        assert_equal(len(slow_queries.traces), 1)
+        assert_equal(slow_queries.traces[0][0], 'a:9160')
+
+
+class TestTrafficStatsLogger(TestCase):
+
+    def test_attribution(self):
+        traffic = TrafficStatsLogger()
+        conn = _TracedConnection(('key', ColumnParent('Standard1'),
+                                  SlicePredicate(column_names=['a']), 1))
+        for i in range(2):
+            traffic.request_finished({'method': 'get_slice', 'connection': conn,
+                                      'bytes_sent': 50, 'bytes_received': 4000})
+
+        conn.info['request']['args'] = ({'k1': {'Standard1': [1, 2, 3]},
+                                         'k2': {'Super1': [4]}}, 1)
+        traffic.request_finished({'method': 'batch_mutate', 'connection': conn,
+                                  'bytes_sent': 400, 'bytes_received': 20})
+
+        stats = traffic.stats
+        assert_equal(stats['Standard1']['get_slice'],
+                     {'calls': 2, 'sent': 100, 'received': 8000})
+        assert_equal(stats['Standard1']['batch_mutate']['sent'], 300)
+        assert_equal(stats['Super1']['batch_mutate']['sent'], 100)
+        assert_equal(traffic.top(1)[0][:2], ('Standard1', 'get_slice'))
+        assert_equal(traffic.top(1, by='sent')[0][:2], ('Standard1', 'batch_mutate'))